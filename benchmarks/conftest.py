@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import NamedTuple
+
+import pytest
+
+from testing.synthetic_db import create_addressbook_db, create_chat_db
+
+DEFAULT_SIZES = "10000"
+CHAT_NAME = "Chat 1"
+
+
+class SYNTHETIC(NamedTuple):
+    chat_path: str
+    addressbook_path: str
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--sizes", default=DEFAULT_SIZES, help="comma separated amounts of messages to benchmark with, e.g. 10000,100000,1000000,5000000")
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "size" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("sizes").split(",")]
+        metafunc.parametrize("size", sizes, ids=[f"{size}-messages" for size in sizes], scope="session")
+
+
+@pytest.fixture(scope="session")
+def synthetic(size: int, tmp_path_factory: pytest.TempPathFactory) -> SYNTHETIC:
+    # created once for each size and shared by every benchmark
+    directory: Path = tmp_path_factory.mktemp(f"synthetic-{size}")
+    synthetic = SYNTHETIC(f"{directory}/chat.db", f"{directory}/AddressBook-v22.abcddb")
+    create_chat_db(synthetic.chat_path, size)
+    create_addressbook_db(synthetic.addressbook_path)
+    return synthetic
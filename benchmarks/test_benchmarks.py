@@ -0,0 +1,68 @@
+import os
+from typing import Any
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.conftest import CHAT_NAME, SYNTHETIC
+from chat_summary.chat import MESSAGE, ChatSummary
+from chat_summary.chat_summary import main
+from chat_summary.dispatcher import get_message_prefixes
+from chat_summary.game import Game
+from chat_summary.games import BUILTIN_GAMES
+from chat_summary.messages import MessagesDB
+from chat_summary.read_messages import MessageFilter, connect_read_only, read_messages
+from testing.synthetic_db import get_room_names
+
+GAME_FLAGS = ["-B", "-C", "-M", "-N", "-S", "-W"]  # the games in a synthetic chat.db
+
+
+def create_games() -> tuple[Game, ...]:
+    return tuple(game() for game in BUILTIN_GAMES)
+
+
+@pytest.fixture(scope="session")
+def messages_db(synthetic: SYNTHETIC) -> MessagesDB:
+    return MessagesDB("user", [CHAT_NAME], True, chat_paths=[synthetic.chat_path], addressbook_path=synthetic.addressbook_path)
+
+
+@pytest.fixture(scope="session")
+def messages(synthetic: SYNTHETIC) -> list[MESSAGE]:
+    connection = connect_read_only(synthetic.chat_path)
+    return list(read_messages(connection, tuple(get_room_names(1)), "user", MessageFilter(prefixes=get_message_prefixes(create_games()))))
+
+
+def test_read_messages(benchmark: BenchmarkFixture, synthetic: SYNTHETIC):
+    connection = connect_read_only(synthetic.chat_path)
+    message_filter = MessageFilter(prefixes=get_message_prefixes(create_games()))
+    count = benchmark(lambda: sum(1 for _ in read_messages(connection, tuple(get_room_names(1)), "user", message_filter)))
+    assert count > 0
+
+
+def test_get_chat_members(benchmark: BenchmarkFixture, messages_db: MessagesDB):
+    def setup() -> tuple[tuple[Any, ...], dict[str, Any]]:
+        messages_db._contacts_loaded = False  # pyright: ignore[reportPrivateUsage]
+        return (messages_db._connections[0], 1), {}  # pyright: ignore[reportPrivateUsage]
+
+    members = benchmark.pedantic(messages_db._get_chat_members, setup=setup, rounds=20)  # pyright: ignore[reportPrivateUsage]
+    assert members[0].name == "Member1 Synthetic"
+
+
+def test_populate(benchmark: BenchmarkFixture, messages_db: MessagesDB, messages: list[MESSAGE]):
+    members = messages_db._get_chat_members(messages_db._connections[0], 1)  # pyright: ignore[reportPrivateUsage]
+
+    def setup() -> tuple[tuple[Any, ...], dict[str, Any]]:
+        return (ChatSummary(members, create_games(), "user"), messages), {}
+
+    benchmark.pedantic(ChatSummary.populate, setup=setup, rounds=3)
+
+
+def test_get_display(benchmark: BenchmarkFixture, messages_db: MessagesDB, messages: list[MESSAGE]):
+    chat_summary = ChatSummary(messages_db._get_chat_members(messages_db._connections[0], 1), create_games(), "user")  # pyright: ignore[reportPrivateUsage]
+    chat_summary.populate(messages)
+    assert "WORDLE" in benchmark(chat_summary.get_display)
+
+
+def test_end_to_end(benchmark: BenchmarkFixture, synthetic: SYNTHETIC):
+    arguments = ["user", CHAT_NAME, "--database", synthetic.chat_path, "--addressbook", synthetic.addressbook_path, "--output", os.devnull, *GAME_FLAGS]
+    assert benchmark.pedantic(main, (arguments,), rounds=3) == 0
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Iterator, NamedTuple
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock_file(file: IO[str], exclusive: bool) -> None:
+        # windows has no shared locks, so readers take turns too
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)  # gives up after about 10 seconds
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(file: IO[str]) -> None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock_file(file: IO[str], exclusive: bool) -> None:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock_file(file: IO[str]) -> None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+
+CACHE_VERSION = 1
+CACHE_MAX_AGE_SECONDS = 30 * 86_400
+CACHE_MAX_BYTES = 16 * 1_024 * 1_024
+
+
+class CACHED_OUTPUT(NamedTuple):
+    output: str
+    errors: str  # printed to stderr while rendering, e.g. games with no messages
+
+
+def get_cache_dir() -> str:
+    if "XDG_CACHE_HOME" in os.environ:
+        return os.path.join(os.environ["XDG_CACHE_HOME"], "chat-summary")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/chat-summary")
+    return os.path.expanduser("~/.cache/chat-summary")
+
+
+def get_tool_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version  # slow to import, and only needed to cache
+
+    try:
+        return version("chat-summary")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def get_cache_key(fields: dict[str, Any]) -> str:
+    # every input the output depends on, when any of them change the summary is rendered again
+    encoded = json.dumps({"cache_version": CACHE_VERSION, "tool_version": get_tool_version(), **fields}, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, path: str, max_age: float = CACHE_MAX_AGE_SECONDS, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self._path = path
+        self._max_age = max_age
+        self._max_bytes = max_bytes
+
+    @contextmanager
+    def _lock(self, exclusive: bool) -> Iterator[None]:
+        # shared by every run using the cache directory, e.g. overlapping cron jobs
+        os.makedirs(self._path, exist_ok=True)
+        with open(os.path.join(self._path, ".lock"), "a+") as lock_file:
+            _lock_file(lock_file, exclusive)
+            try:
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._path, f"{key}.json")
+
+    def get(self, key: str) -> CACHED_OUTPUT | None:
+        path = self._entry_path(key)
+        try:
+            with self._lock(exclusive=False):
+                with open(path, encoding="utf-8") as file:
+                    entry: dict[str, str] = json.load(file)
+                if time.time() - os.stat(path).st_mtime > self._max_age:
+                    return None
+                os.utime(path)  # the least recently used entries are evicted first
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            print("unable to read summary cache, rendering summary", file=sys.stderr)
+            return None
+        return CACHED_OUTPUT(entry["output"], entry["errors"])
+
+    def put(self, key: str, cached: CACHED_OUTPUT) -> None:
+        path = self._entry_path(key)
+        try:
+            with self._lock(exclusive=True):
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(cached._asdict(), file, ensure_ascii=False)
+                os.replace(temp_path, path)  # never leave a half written entry behind
+                self._evict()
+        except OSError:
+            print("unable to write summary cache", file=sys.stderr)
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []  # (last used, size, path)
+        for entry in os.scandir(self._path):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort(reverse=True)  # newest first
+        now = time.time()
+        total = 0
+        for last_used, size, path in entries:
+            total += size
+            if now - last_used > self._max_age or total > self._max_bytes:
+                os.remove(path)
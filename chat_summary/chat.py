@@ -1,14 +1,49 @@
 import io
 import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby
 from math import inf
-from typing import Iterable, NamedTuple
+from operator import attrgetter
+from typing import Any, Callable, Iterable, NamedTuple
 
-from chat_summary.game import Game, GameScore
+from chat_summary.dispatcher import GameDispatcher
+from chat_summary.game import RESULT, Game, GameScore
+from chat_summary.profiler import Profiler, get_profiler, profile_stage
+from chat_summary.results import ResultStore
+
+
+ANALYSE_BATCH_SIZE = 1_000  # messages parsed together by each game
+PARALLEL_CHUNK_SIZE = 5_000  # messages handed to a worker process at a time
 
 
 class MESSAGE(NamedTuple):
     content: str
     phone_number: str
+    rowid: int = 0
+    chat_id: str = ""
+    guid: str = ""  # identifies the same message across copies of the database
+    date: int = 0  # nanoseconds since 2001-01-01, as chat.db stores it
+
+
+READ = tuple[str, int, int, int]  # (cleaned content, member id, rowid, date) of a message from a member
+
+
+class MEMBER_SUMMARY(NamedTuple):
+    name: str
+    number: str
+    completed: int
+    attempts: int
+    average_guesses: float
+    completion_rank: int | None  # None when the member has no completed games
+    average_rank: int | None
+
+
+class GAME_SUMMARY(NamedTuple):
+    game: str
+    days: int
+    members: list[MEMBER_SUMMARY]
 
 
 class ChatMember:
@@ -21,32 +56,219 @@ class ChatMember:
         return f"({self.name}, {self.number})"
 
 
+class CHAT(NamedTuple):
+    name: str
+    members: list[ChatMember]
+
+
+def normalise_handle(handle: str | None) -> str:
+    if not handle:
+        return ""
+    if "@" in handle:  # email handles are case insensitive
+        return handle.strip().lower()
+
+    handle = "".join(handle.split())  # remove spaces
+    if handle.startswith("0"):  # replace 0 at start with +61
+        handle = "+61" + handle[1:]
+    return handle
+
+
+class MemberDirectory:
+    def __init__(self, members: list[ChatMember], self_handle: str = "") -> None:
+        self.members = tuple(members)  # indexed by member id
+        self._ids: dict[str, int] = {}
+        for member_id, member in enumerate(members):
+            self._ids.setdefault(normalise_handle(member.number), member_id)
+
+        # messages sent by the user have no handle, the user's member may be stored under either
+        self_id = self._ids.get("", self._ids.get(normalise_handle(self_handle)))
+        if self_id is not None:
+            self._ids[""] = self_id
+            self._ids[normalise_handle(self_handle)] = self_id
+
+        self._cache: dict[str | None, int | None] = {}  # raw handle -> member id, avoids normalising every message
+
+    def get(self, handle: str | None) -> int | None:
+        try:
+            return self._cache[handle]
+        except KeyError:
+            member_id = self._cache[handle] = self._ids.get(normalise_handle(handle))
+            return member_id
+
+
 class ChatSummary:
-    def __init__(self, members: list[ChatMember], games: tuple[Game, ...]) -> None:
+    def __init__(self, members: list[ChatMember], games: tuple[Game, ...], self_handle: str = "", record_results: bool = False, show_stats: bool = True) -> None:
         self._members = members
         self._games = games
+        self._dispatcher = GameDispatcher(games)
+        self._directory = MemberDirectory(members, self_handle)
+        self._scores: dict[str, list[GameScore]] = {}  # game name -> scores indexed by member id
+        self._last_rowid = 0
+        self._results = ResultStore([type(game).__name__ for game in games]) if record_results else None  # every result, for statistics beyond the scores
+        self._show_stats = show_stats  # of the recorded results
+        self._results_added = 0  # so callers can tell whether reading more messages changed anything
+        self._reads: list[READ] = []  # read but not yet parsed
+
+        for game in games:
+            name = type(game).__name__
+            self._scores[name] = [GameScore() for _ in members]
+            for member, game_score in zip(members, self._scores[name]):
+                member.game_scores[name] = game_score
+
+    @property
+    def last_rowid(self) -> int:
+        return self._last_rowid
+
+    @property
+    def members(self) -> tuple[ChatMember, ...]:
+        return self._directory.members  # indexed by member id
+
+    @property
+    def results_added(self) -> int:
+        return self._results_added
+
+    @property
+    def results(self) -> ResultStore | None:
+        return self._results
+
+    def get_state(self) -> dict[str, Any]:
+        return {
+            "last_rowid": self._last_rowid,
+            "ranges": {type(game).__name__: game.get_state() for game in self._games},
+            "scores": {name: {member.number: game_score.get_state() for member, game_score in zip(self._directory.members, game_scores)} for name, game_scores in self._scores.items()},
+        }
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        self._last_rowid = state["last_rowid"]
+        for game in self._games:
+            game.load_state(state["ranges"][type(game).__name__])
+
+        for name, game_scores in self._scores.items():
+            for number, game_score_state in state["scores"][name].items():
+                member_id = self._directory.get(number)
+                if member_id is not None:  # member may have left the chat since the state was saved
+                    game_scores[member_id].load_state(game_score_state)
 
-        for member in self._members:
-            for game in games:
-                name = type(game).__name__
-                member.game_scores[name] = GameScore()
+    def _read_message(self, message: MESSAGE) -> READ | None:
+        content, phone_number, rowid = message.content, message.phone_number, message.rowid
+        if rowid > self._last_rowid:
+            self._last_rowid = rowid
 
-    def populate(self, messages: Iterable[MESSAGE]) -> None:
-        for content, phone_number in messages:
-            phone_number = phone_number or ""
-            member = next((member for member in self._members if member.number == phone_number), None)
-            if not member or not content:
+        member_id = self._directory.get(phone_number)
+        if member_id is None or not content:
+            return None
+
+        return _clean(content), member_id, rowid, message.date
+
+    def _merge(self, games: tuple[Game, ...], scores: dict[str, dict[int, GameScore]], results: ResultStore | None, results_added: int) -> None:
+        self._results_added += results_added
+        for game, other in zip(self._games, games):
+            game.merge(other)
+
+        for name, member_scores in scores.items():
+            for member_id, game_score in member_scores.items():
+                self._scores[name][member_id].merge(game_score)
+
+        if self._results is not None and results is not None:
+            self._results.merge(results)
+
+    def _add(self, game: Game, read: READ, result: RESULT) -> None:
+        _, member_id, rowid, date = read
+        self._results_added += 1
+        self._scores[type(game).__name__][member_id].add(result)
+        if self._results is not None:
+            self._results.add(type(game).__name__, member_id, result, rowid, date)
+
+    def _read_messages(self, messages: Iterable[MESSAGE], profiler: Profiler | None = None) -> None:
+        # reads are kept between calls and parsed a batch at a time, so each game matches many messages in one call
+        for message in messages:
+            if profiler is None:
+                read = self._read_message(message)
+            else:
+                start = time.perf_counter_ns()
+                read = self._read_message(message)
+                profiler.add_time("resolve members", time.perf_counter_ns() - start, 1)
+            if read is None:
                 continue
 
-            for game in self._games:
-                message = content.replace("�", "")
-                message = message.replace("\x00", "")
-                result = game.analyse_message(message)
-                if result is None:
-                    continue
-                member.game_scores[type(game).__name__].add(result)
+            self._reads.append(read)
+            if len(self._reads) >= ANALYSE_BATCH_SIZE:
+                self._flush_reads(profiler)
+
+    def _flush_reads(self, profiler: Profiler | None = None) -> None:
+        reads, self._reads = self._reads, []
+        if reads:
+            self._analyse_batch(reads, profiler)
+
+    def populate(self, messages: Iterable[MESSAGE], workers: int = 1) -> None:
+        if workers > 1:
+            _populate_parallel(lambda _: self, messages, workers)
+            return
+
+        profiler = get_profiler()
+        self._read_messages(messages, profiler)
+        self._flush_reads(profiler)
+
+    def _analyse_batch(self, reads: list[READ], profiler: Profiler | None = None) -> None:
+        contents = [read[0] for read in reads]
+        if profiler is None:
+            for i, game, result in self._dispatcher.dispatch_batch(contents):
+                self._add(game, reads[i], result)
+            return
+
+        start = time.perf_counter_ns()
+        dispatched = self._dispatcher.dispatch_batch(contents)
+        profiler.add("parse games", start, time.perf_counter_ns(), len(contents))
+
+        matched: set[int] = set()
+        for i, game, result in dispatched:
+            matched.add(i)
+            profiler.count_game(type(game).__name__, True)
+            self._add(game, reads[i], result)
+        for i, content in enumerate(contents):
+            if i not in matched:
+                rejected = self._dispatcher.get_route(content)
+                profiler.count_game("(no game)" if rejected is None else type(rejected).__name__, False)
+
+    def _get_rankings(self, game_name: str) -> tuple[list[int], list[int]]:
+        # member ids with a score, by completions and by average, in the order both the summary and the exports rank them
+        # sorted copies, so members tied in one render stay in the same order in the next
+        game_scores = self._scores[game_name]
+        by_completed = sorted(range(len(game_scores)), key=lambda member_id: game_scores[member_id].completed, reverse=True)
+        by_average = sorted(by_completed, key=lambda member_id: game_scores[member_id].average_guesses or inf)
+        return [member_id for member_id in by_completed if game_scores[member_id].completed], [member_id for member_id in by_average if game_scores[member_id].average_guesses]
+
+    def get_summaries(self) -> list[GAME_SUMMARY]:
+        game_summaries: list[GAME_SUMMARY] = []
+        for game in self._games:
+            game_name = type(game).__name__
+            game_scores = self._scores[game_name]
+
+            by_completed, by_average = self._get_rankings(game_name)
+            completion_ranks = {member_id: rank for rank, member_id in enumerate(by_completed, start=1)}
+            average_ranks = {member_id: rank for rank, member_id in enumerate(by_average, start=1)}
+
+            members = [
+                MEMBER_SUMMARY(
+                    member.name,
+                    member.number,
+                    game_score.completed,
+                    game_score.attempts,
+                    game_score.average_guesses,
+                    completion_ranks.get(member_id),
+                    average_ranks.get(member_id),
+                )
+                for member_id, (member, game_score) in enumerate(zip(self._directory.members, game_scores))
+            ]
+            game_summaries.append(GAME_SUMMARY(game_name, game.range, members))
+
+        return game_summaries
 
     def get_display(self) -> str:
+        with profile_stage("render"):
+            return self._get_display()
+
+    def _get_display(self) -> str:
         out = io.StringIO()
         for i, game in enumerate(self._games):
             game_name = type(game).__name__
@@ -59,30 +281,107 @@ class ChatSummary:
 
             max_name_length = len(max(self._members, key=lambda user: len(user.name)).name)  # get the length of the longest name
 
-            self._members.sort(key=lambda member: member.game_scores[game_name].completed, reverse=True)
+            by_completed, by_average = self._get_rankings(game_name)
 
             is_everyone_100_percent = all(game_score.completed == game_score.attempts for game_score in (member.game_scores[game_name] for member in self._members))
             out.write(f"COMPLETIONS ({total_days} days)\n")
-            for j, member in enumerate(self._members, start=1):
+            for j, member_id in enumerate(by_completed, start=1):
+                member = self._members[member_id]
                 game_score = member.game_scores[game_name]
-                if game_score.completed == 0:
-                    continue
-
                 if is_everyone_100_percent:
                     out.write(f"{j}. {member.name:.<{max_name_length}}..{game_score.completed}\n")
                 else:
                     completion_percentage = (game_score.completed / game_score.attempts) * 100
                     out.write(f"{j}. {member.name:.<{max_name_length}}..{game_score.completed}/{game_score.attempts} ({completion_percentage:.1f}%)\n")
 
-            self._members.sort(key=lambda member: inf if member.game_scores[game_name].average_guesses == 0 else member.game_scores[game_name].average_guesses)
             out.write(f"\nAVERAGE {game.get_score_title()}\n")
-            for k, member in enumerate(self._members, start=1):
-                game_score = member.game_scores[game_name]
-                if game_score.average_guesses == 0:
-                    continue
-                out.write(f"{k}. {member.name:.<{max_name_length}}..{game_score.average_guesses:.2f}\n")
+            for k, member_id in enumerate(by_average, start=1):
+                member = self._members[member_id]
+                out.write(f"{k}. {member.name:.<{max_name_length}}..{member.game_scores[game_name].average_guesses:.2f}\n")
+
+            if self._results is not None and self._show_stats:
+                stats = self._results.get_guess_stats(game_name)
+                ranked = sorted(stats.items(), key=lambda item: (item[1].median, item[1].std))
+                out.write(f"\nMEDIAN {game.get_score_title()} (± STD DEV)\n")
+                for k, (member_id, guess_stats) in enumerate(ranked, start=1):
+                    name = self._directory.members[member_id].name
+                    out.write(f"{k}. {name:.<{max_name_length}}..{guess_stats.median:.1f} ± {guess_stats.std:.2f}\n")
 
             if i != len(self._games) - 1:
                 out.write("\n")
 
         return out.getvalue()
+
+
+def populate_chats(chat_summaries: dict[str, ChatSummary], messages: Iterable[MESSAGE], workers: int = 1) -> None:
+    if workers > 1:
+        with profile_stage("read and parse messages"):
+            _populate_parallel(lambda message: chat_summaries[message.chat_id], messages, workers)
+        return
+
+    # hand each run of consecutive messages from the same chat to that chat's summary, which keeps them until it has a whole batch
+    profiler = get_profiler()
+    with profile_stage("read and parse messages"):
+        for chat_id, chat_messages in groupby(messages, key=attrgetter("chat_id")):
+            chat_summaries[chat_id]._read_messages(chat_messages, profiler)
+        for chat_summary in chat_summaries.values():
+            chat_summary._flush_reads(profiler)
+
+
+CHUNK_RESULT = tuple[tuple[Game, ...], dict[str, dict[int, GameScore]], ResultStore | None, int]
+
+
+def _clean(content: str) -> str:
+    return content.replace("�", "").replace("\x00", "")
+
+
+def _analyse_chunk(games: tuple[Game, ...], chunk: list[READ], record_results: bool) -> CHUNK_RESULT:
+    # runs in a worker process, starting from fresh games so the ranges only cover this chunk
+    games = tuple(type(game)() for game in games)
+    dispatcher = GameDispatcher(games)
+    scores: dict[str, dict[int, GameScore]] = {type(game).__name__: {} for game in games}
+    results = ResultStore(list(scores)) if record_results else None
+
+    dispatched = dispatcher.dispatch_batch([read[0] for read in chunk])
+    for i, game, result in dispatched:
+        _, member_id, rowid, date = chunk[i]
+        member_scores = scores[type(game).__name__]
+        if member_id not in member_scores:
+            member_scores[member_id] = GameScore()
+        member_scores[member_id].add(result)
+        if results is not None:
+            results.add(type(game).__name__, member_id, result, rowid, date)
+
+    return games, scores, results, len(dispatched)
+
+
+def _populate_parallel(get_summary: Callable[[MESSAGE], ChatSummary], messages: Iterable[MESSAGE], workers: int) -> None:
+    chunks: dict[ChatSummary, list[READ]] = {}
+    in_flight: deque[tuple[ChatSummary, Future[CHUNK_RESULT]]] = deque()
+
+    with ProcessPoolExecutor(workers) as executor:
+
+        def submit(chat_summary: ChatSummary) -> None:
+            in_flight.append((chat_summary, executor.submit(_analyse_chunk, chat_summary._games, chunks.pop(chat_summary), chat_summary._results is not None)))
+            while len(in_flight) > workers * 2:  # bound the amount of messages waiting to be parsed
+                merge_next()
+
+        def merge_next() -> None:
+            chat_summary, future = in_flight.popleft()  # merged in the order submitted
+            chat_summary._merge(*future.result())
+
+        for message in messages:
+            chat_summary = get_summary(message)
+            read = chat_summary._read_message(message)
+            if read is None:
+                continue
+
+            chunk = chunks.setdefault(chat_summary, [])
+            chunk.append(read)
+            if len(chunk) >= PARALLEL_CHUNK_SIZE:
+                submit(chat_summary)
+
+        for chat_summary in list(chunks):
+            submit(chat_summary)
+        while in_flight:
+            merge_next()
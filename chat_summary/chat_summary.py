@@ -1,42 +1,302 @@
 import argparse
-from typing import Sequence
+import datetime
+import io
+import os
+import shlex
+import sys
+import time
+from contextlib import nullcontext, redirect_stderr
+from typing import TYPE_CHECKING, Callable, ContextManager, Sequence, TextIO
 
 import chat_summary.messages as chat_summary_messages
-from chat_summary.chat import ChatSummary
+from chat_summary.chat import CHAT, ChatSummary, populate_chats
+from chat_summary.dispatcher import get_message_prefixes
+from chat_summary.export import FORMATS, write_csv, write_json, write_results_csv, write_results_json, write_results_text
 from chat_summary.game import Game
-from chat_summary.get_available_games import get_available_chat_games
-from chat_summary.send_message import send_message
+from chat_summary.get_available_games import get_available_chat_games, load_chat_games
+from chat_summary.index import ResultIndex
+from chat_summary.profiler import start_profiler, stop_profiler
+from chat_summary.read_messages import DEFAULT_BATCH_SIZE, MessageFilter
+from chat_summary.send_message import DEFAULT_CONCURRENCY, program_command, report_results, send_message, send_messages
+from chat_summary.state import read_state, write_state
+
+if TYPE_CHECKING:
+    from chat_summary.cache import SummaryCache
 
 
 def main(argv: Sequence[str] | None = None) -> int:
-    argparser = argparse.ArgumentParser()
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "query":
+        return query(argv[1:])
+
+    argparser = argparse.ArgumentParser(epilog="run 'chat-summary query --help' to look up results kept with --index")
     argparser.add_argument("user", help="user's login name")
-    argparser.add_argument("chat_name", help="name of chat to get summary of")
+    argparser.add_argument("chat_names", nargs="*", metavar="chat_name", help="names of chats to get summaries of")
+    argparser.add_argument("--all-chats", action="store_true", help="get summaries of every named group chat")
     argparser.add_argument("--silence-contacts", action="store_true", help="silence the 'unable to find contacts' error")
     argparser.add_argument("--send-message", action="store_true", help="send results back to group chat")
-    for name, game in get_available_chat_games():
-        argparser.add_argument(f"-{name[0]}", f"--{name}", dest="games", action="append_const", const=game)
+    argparser.add_argument("--send-command", type=shlex.split, help="send with this program instead of Messages, it is given the chat name and message as its last two arguments")
+    argparser.add_argument("--send-concurrency", type=int, default=DEFAULT_CONCURRENCY, help="amount of chats to send to at a time in a batch")
+    argparser.add_argument("--format", choices=FORMATS, default="text", help="print the summary as text, or as json (a line per chat) or csv (a row per member of each game)")
+    argparser.add_argument("--output", help="file to write the summary to instead of stdout")
+    argparser.add_argument("--state-file", help="file to keep the summary in between runs, so only new messages are read")
+    argparser.add_argument("--database", dest="databases", action="append", help="read messages from this copy of chat.db instead of the user's, can be repeated to merge copies")
+    argparser.add_argument("--addressbook", help="read contact names from this AddressBook .abcddb instead of the user's")
+    argparser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="amount of messages to read from the database at a time")
+    argparser.add_argument("--workers", type=int, default=1, help="amount of processes to parse messages with")
+    argparser.add_argument("--stats", action="store_true", help="include the median and spread of each member's guesses (requires numpy)")
+    argparser.add_argument("--profile", action="store_true", help="report the time spent in each stage of the run to stderr")
+    argparser.add_argument("--profile-memory", action="store_true", help="also report the peak memory use, slows the run down")
+    argparser.add_argument("--profile-trace", help="also write the profile as a chrome trace to this file")
+    argparser.add_argument("--since", type=datetime.date.fromisoformat, help="only include messages sent on or after this date (YYYY-MM-DD)")
+    argparser.add_argument("--until", type=datetime.date.fromisoformat, help="only include messages sent on or before this date (YYYY-MM-DD)")
+    argparser.add_argument("--member", dest="members", action="append", help="only include messages from this member's name or number, can be repeated")
+    argparser.add_argument("--index", help="also keep every result read in this file, to look them up with 'chat-summary query'")
+    argparser.add_argument("--cache", action="store_true", help="reuse the last summary when no messages have arrived and the contacts haven't changed since")
+    argparser.add_argument("--cache-dir", help="directory to keep cached summaries in instead of the user's cache directory")
+    argparser.add_argument("--watch", action="store_true", help="keep running, and print the summary again whenever a new game result changes it")
+    argparser.add_argument("--watch-interval", type=float, default=2.0, help="seconds between checks for new messages when watching")
+    available_games = get_available_chat_games()
+    short_flags = {"-h"}
+    for name in available_games:
+        flags = [f"--{name}"]
+        if f"-{name[0]}" not in short_flags:  # first game with a letter gets the short flag
+            short_flags.add(f"-{name[0]}")
+            flags.insert(0, f"-{name[0]}")
+        argparser.add_argument(*flags, dest="games", action="append_const", const=name)
 
     args = argparser.parse_args(argv)
+    if not args.chat_names and not args.all_chats:
+        argparser.error("a chat_name or --all-chats is required")
+    if args.chat_names and args.all_chats:
+        argparser.error("chat names can't be combined with --all-chats")
+    is_batch = args.all_chats or len(args.chat_names) > 1
+    if args.send_message and (args.format != "text" or args.output):
+        argparser.error("--send-message can't be combined with --format or --output")
+    if args.state_file and is_batch:
+        argparser.error("--state-file can only be used with a single chat")
+    if args.state_file and (args.since or args.until or args.members):
+        argparser.error("--state-file can't be combined with --since, --until or --member")
+    if args.state_file and args.stats:  # the guesses behind the statistics aren't kept in the state
+        argparser.error("--state-file can't be combined with --stats")
+    if args.state_file and args.databases and len(args.databases) > 1:
+        argparser.error("--state-file can only be used with a single --database")
+    if args.send_concurrency < 1:  # no chat would ever be sent
+        argparser.error("--send-concurrency must be at least 1")
+    if args.watch and args.send_message:
+        argparser.error("--watch can't be combined with --send-message")
+    if args.watch and args.databases and len(args.databases) > 1:
+        argparser.error("--watch can only be used with a single --database")
+    if args.cache and (args.send_message or args.state_file or args.watch or args.index):
+        argparser.error("--cache can't be combined with --send-message, --state-file, --watch or --index")
+
+    if not (args.profile or args.profile_memory or args.profile_trace):
+        return _summarise(args, available_games, is_batch)
+
+    profiler = start_profiler(args.profile_memory)
+    try:
+        return _summarise(args, available_games, is_batch)
+    finally:
+        stop_profiler()
+        print(profiler.get_report(), file=sys.stderr)
+        if args.profile_trace:
+            profiler.write_trace(args.profile_trace)
+
+
+def _summarise(args: argparse.Namespace, available_games: dict[str, Callable[[], type[Game]]], is_batch: bool) -> int:
+    games = load_chat_games(available_games, args.games or [])  # only the selected games are created
+    game_names = [type(game).__name__ for game in games]
+
+    state = read_state(args.state_file, args.chat_names[0], game_names) if args.state_file else None
+
+    messages_connection = chat_summary_messages.MessagesDB(args.user, None if args.all_chats else args.chat_names, args.silence_contacts, args.batch_size, args.databases, args.addressbook)
+    cache: "SummaryCache | None" = None
+    cache_key = ""
+    if args.cache:  # checked before the contacts are loaded or any messages are read
+        from chat_summary.cache import SummaryCache, get_cache_dir  # only imported when caching, as file locking differs by platform
+
+        cache = SummaryCache(args.cache_dir or get_cache_dir())
+        cache_key = _get_cache_key(args, messages_connection, game_names, is_batch)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            sys.stderr.write(cached.errors)
+            _write(args, cached.output)
+            return 0
 
-    games: list[Game] = list(set(args.games or []))
-    games.sort(key=lambda cls: type(cls).__name__)
+    message_filter = MessageFilter(state["last_rowid"] if state else 0, get_message_prefixes(games), args.since, args.until, tuple(args.members) if args.members else None)
+    messages, chats = messages_connection.get_messages_members_from_chats(message_filter)
 
-    messages_connection = chat_summary_messages.MessagesDB(args.user, args.chat_name, args.silence_contacts)
-    messages, members = messages_connection.get_messages_members_from_chat()
+    # every chat keeps its own game ranges, so each gets its own games
+    chat_summaries = {
+        chat_id: ChatSummary(chat.members, tuple(load_chat_games(available_games, args.games or [])), args.user, args.stats or bool(args.index), args.stats) for chat_id, chat in chats.items()
+    }
+    if state:
+        next(iter(chat_summaries.values())).load_state(state)
+    populate_chats(chat_summaries, messages, args.workers)
+    if args.index:
+        _update_index(args.index, chats, chat_summaries)
 
-    chat_summary = ChatSummary(members, tuple(games))
-    chat_summary.populate(messages)
-    summary = chat_summary.get_display()
+    if args.state_file:
+        write_state(args.state_file, args.chat_names[0], game_names, next(iter(chat_summaries.values())))
 
     if args.send_message:
-        if input("are you sure you want to send the message? (Y): ") == "Y":
-            send_message(args.chat_name, summary)
-    else:
-        print(summary)
+        summaries = {chats[chat_id].name: chat_summary.get_display() for chat_id, chat_summary in chat_summaries.items()}
+        if input("are you sure you want to send the message? (Y): ") != "Y":
+            return 0
+
+        command = program_command(args.send_command) if args.send_command else None
+        if not is_batch:
+            send_message(*next(iter(summaries.items())), command)
+            return 0
+        # don't stop the batch for a chat with no games, or one that couldn't be sent to, each is reported
+        results = send_messages(summaries, command, args.send_concurrency)
+        return 0 if report_results(results) else 1
+
+    if not cache and not args.watch:
+        with _open_output(args) as out:  # each chat is written as soon as it is rendered
+            _render(args, chats, chat_summaries, is_batch, out)
+        return 0
+
+    errors = io.StringIO()
+    with redirect_stderr(errors) if cache else nullcontext():
+        rendered = _render_text(args, chats, chat_summaries, is_batch)
+    if cache:
+        from chat_summary.cache import CACHED_OUTPUT
+
+        sys.stderr.write(errors.getvalue())
+        cache.put(cache_key, CACHED_OUTPUT(rendered, errors.getvalue()))
+    _write(args, rendered)
+    if args.watch:
+        return _watch(args, messages_connection, chats, chat_summaries, is_batch, game_names, rendered)
+    return 0
+
+
+def _watch(
+    args: argparse.Namespace,
+    messages_connection: chat_summary_messages.MessagesDB,
+    chats: dict[str, CHAT],
+    chat_summaries: dict[str, ChatSummary],
+    is_batch: bool,
+    game_names: list[str],
+    rendered: str,
+) -> int:
+    # the connection stays open and only the rows added since the last check are read into the summaries
+    after_rowid = max((chat_summary.last_rowid for chat_summary in chat_summaries.values()), default=0)
+    indexed = {chat_id: chat_summary.results.get_counts() for chat_id, chat_summary in chat_summaries.items() if chat_summary.results is not None}  # already added to the index
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            last_rowid = messages_connection.get_last_rowid()
+            if last_rowid <= after_rowid:
+                continue
+
+            results_added = sum(chat_summary.results_added for chat_summary in chat_summaries.values())
+            populate_chats(chat_summaries, messages_connection.get_new_messages(after_rowid), args.workers)
+            # rows added after the check may have been read too, and must not be counted twice
+            after_rowid = max(last_rowid, *(chat_summary.last_rowid for chat_summary in chat_summaries.values()))
+            if args.state_file:
+                write_state(args.state_file, args.chat_names[0], game_names, next(iter(chat_summaries.values())))
+            if sum(chat_summary.results_added for chat_summary in chat_summaries.values()) == results_added:
+                continue  # most new messages aren't game results
+
+            if args.index:
+                _update_index(args.index, chats, chat_summaries, indexed)
+            updated = _render_text(args, chats, chat_summaries, is_batch)
+            if updated != rendered:  # e.g. a second go at a game already counted
+                rendered = updated
+                _write(args, rendered, clear=True)
+    except KeyboardInterrupt:
+        return 0
 
+
+def _update_index(path: str, chats: dict[str, CHAT], chat_summaries: dict[str, ChatSummary], indexed: dict[str, dict[str, int]] | None = None) -> None:
+    # indexed is the results of each game already added from each chat, and is moved past the results added now
+    index = ResultIndex(path)
+    for chat_id, chat_summary in chat_summaries.items():
+        index.add(chats[chat_id].name, chat_summary, indexed.get(chat_id) if indexed is not None else None)
+        if indexed is not None and chat_summary.results is not None:
+            indexed[chat_id] = chat_summary.results.get_counts()
+    index.close()
+
+
+def query(argv: Sequence[str]) -> int:
+    argparser = argparse.ArgumentParser(prog="chat-summary query", description="look up results kept with --index, without reading the messages again")
+    argparser.add_argument("index", help="file given to --index")
+    argparser.add_argument("--chat", help="only results from this chat")
+    argparser.add_argument("--game", help="only results of this game, e.g. Wordle")
+    argparser.add_argument("--member", help="only results from this member's name or number")
+    argparser.add_argument("--number", dest="game_number", type=int, help="only results of this game number, e.g. 1042 for Wordle 1,042")
+    argparser.add_argument("--format", choices=FORMATS, default="text", help="print the results as a table, or as json (a line per result) or csv")
+    argparser.add_argument("--output", help="file to write the results to instead of stdout")
+    args = argparser.parse_args(argv)
+    if not os.path.isfile(args.index):
+        argparser.error(f"index not found: {args.index}")
+
+    index = ResultIndex(args.index, read_only=True)
+    results = index.query(args.chat, args.game, args.member, args.game_number)
+    index.close()
+    if not results:
+        print("no results found", file=sys.stderr)
+        return 1
+
+    write = {"text": write_results_text, "json": write_results_json, "csv": write_results_csv}[args.format]
+    with open(args.output, "w", encoding="utf-8", newline="") if args.output else nullcontext(sys.stdout) as out:
+        write(out, results)
     return 0
 
 
+def _get_cache_key(args: argparse.Namespace, messages_connection: chat_summary_messages.MessagesDB, game_names: list[str], is_batch: bool) -> str:
+    from chat_summary.cache import get_cache_key
+
+    fields = {
+        "user": args.user,
+        "chats": None if args.all_chats else args.chat_names,
+        "is_batch": is_batch,
+        "games": game_names,
+        "last_rowid": messages_connection.get_last_rowid(),
+        "contacts_version": messages_connection.get_contacts_version(),
+        "databases": args.databases,
+        "addressbook": args.addressbook,
+        "format": args.format,
+        "stats": args.stats,
+        "since": args.since,
+        "until": args.until,
+        "members": args.members,
+    }
+    return get_cache_key(fields)
+
+
+def _render(args: argparse.Namespace, chats: dict[str, CHAT], chat_summaries: dict[str, ChatSummary], is_batch: bool, out: TextIO) -> None:
+    if args.format != "text":
+        export = write_json if args.format == "json" else write_csv
+        export(out, ((chats[chat_id].name, chat_summary.get_summaries()) for chat_id, chat_summary in chat_summaries.items()))
+        return
+
+    for chat_id, chat_summary in chat_summaries.items():
+        if is_batch:
+            print(f"💬 {chats[chat_id].name} 💬", file=out)
+        print(chat_summary.get_display(), file=out)
+
+
+def _render_text(args: argparse.Namespace, chats: dict[str, CHAT], chat_summaries: dict[str, ChatSummary], is_batch: bool) -> str:
+    # the whole output, to cache or compare with the last update
+    out = io.StringIO()
+    _render(args, chats, chat_summaries, is_batch, out)
+    return out.getvalue()
+
+
+def _open_output(args: argparse.Namespace) -> ContextManager[TextIO]:
+    return open(args.output, "w", encoding="utf-8", newline="") if args.output else nullcontext(sys.stdout)
+
+
+def _write(args: argparse.Namespace, rendered: str, clear: bool = False) -> None:
+    # an output file is rewritten with each update, so it always holds the latest summary
+    with _open_output(args) as out:
+        if clear and not args.output and args.format == "text" and out.isatty():
+            out.write("\033[H\033[2J")  # redraw the leaderboard in place
+        out.write(rendered)
+        out.flush()
+
+
 if __name__ == "__main__":
     exit(main())  # pragma: no cover
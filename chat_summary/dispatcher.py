@@ -0,0 +1,61 @@
+from typing import Iterable, Sequence
+
+from chat_summary.game import RESULT, Game, join_batch
+
+
+def get_message_prefixes(games: Iterable[Game]) -> tuple[str, ...] | None:
+    prefixes: list[str] = []
+    for game in games:
+        game_prefixes = game.get_prefixes()
+        if not game_prefixes:  # any message could belong to this game
+            return None
+        prefixes.extend(game_prefixes)
+
+    return tuple(prefixes)
+
+
+class GameDispatcher:
+    def __init__(self, games: Iterable[Game]) -> None:
+        self._routes: dict[str, list[tuple[str, Game]]] = {}  # first character of prefix -> (prefix, game)
+        self._fallbacks: list[Game] = []  # games without a known prefix are tried on every message
+        self._prefixed: list[Game] = []
+
+        for game in games:
+            prefixes = game.get_prefixes()
+            if not prefixes:
+                self._fallbacks.append(game)
+                continue
+            self._prefixed.append(game)
+            for prefix in prefixes:
+                self._routes.setdefault(prefix[0], []).append((prefix, game))
+
+        self._prefixes = tuple(prefix for routes in self._routes.values() for prefix, _ in routes)
+
+    def get_route(self, message: str) -> Game | None:
+        # the first game a message would be given to, to tell which game rejected it
+        if message.startswith(self._prefixes):
+            return next(game for prefix, game in self._routes[message[0]] if message.startswith(prefix))
+        return self._fallbacks[0] if self._fallbacks else None
+
+    def dispatch(self, message: str) -> tuple[Game, RESULT] | None:
+        # a batch of one, so a single message is read exactly as it would be in a batch
+        dispatched = self.dispatch_batch([message])
+        return (dispatched[0][1], dispatched[0][2]) if dispatched else None
+
+    def dispatch_batch(self, messages: Sequence[str]) -> list[tuple[int, Game, RESULT]]:
+        # every game reads the whole batch at once, a message belongs to the first game that accepts it
+        # (games whose prefixes overlap may still see a message an earlier game accepted)
+        buffer = join_batch(messages)
+        claimed: dict[int, tuple[Game, RESULT]] = {}
+        for game in self._prefixed:
+            for i, result in game.analyse_batch(messages, buffer):
+                claimed.setdefault(i, (game, result))
+
+        if self._fallbacks:
+            unclaimed = [i for i in range(len(messages)) if i not in claimed]
+            for game in self._fallbacks:
+                for j, result in game.analyse_batch([messages[i] for i in unclaimed]):
+                    claimed.setdefault(unclaimed[j], (game, result))
+                unclaimed = [i for i in unclaimed if i not in claimed]
+
+        return [(i, game, result) for i, (game, result) in claimed.items()]
@@ -0,0 +1,48 @@
+import csv
+import datetime
+import json
+from typing import Iterable, TextIO
+
+from chat_summary.chat import GAME_SUMMARY, MEMBER_SUMMARY
+from chat_summary.index import INDEXED_RESULT
+
+FORMATS = ("text", "json", "csv")
+CSV_FIELDS = ("chat", "game", "days", *MEMBER_SUMMARY._fields)
+
+
+def write_json(out: TextIO, chat_summaries: Iterable[tuple[str, list[GAME_SUMMARY]]]) -> None:
+    # one line per chat, so a batch can be consumed before it is finished
+    for chat_name, game_summaries in chat_summaries:
+        games = [{"game": game, "days": days, "members": [member._asdict() for member in members]} for game, days, members in game_summaries]
+        out.write(json.dumps({"chat": chat_name, "games": games}, ensure_ascii=False) + "\n")
+        out.flush()
+
+
+def write_csv(out: TextIO, chat_summaries: Iterable[tuple[str, list[GAME_SUMMARY]]]) -> None:
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    for chat_name, game_summaries in chat_summaries:
+        for game, days, members in game_summaries:
+            writer.writerows((chat_name, game, days, *member) for member in members)
+
+
+def write_results_text(out: TextIO, results: list[INDEXED_RESULT]) -> None:
+    rows = [("CHAT", "GAME", "NUMBER", "MEMBER", "RESULT", "DATE")]
+    for result in results:
+        date = datetime.datetime.fromtimestamp(result.date).strftime("%Y-%m-%d %H:%M")
+        rows.append((result.chat, result.game, f"{result.game_number:,}", result.member, str(result.guesses) if result.completed else "X", date))
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        out.write("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() + "\n")
+
+
+def write_results_json(out: TextIO, results: list[INDEXED_RESULT]) -> None:
+    for result in results:
+        out.write(json.dumps(result._asdict(), ensure_ascii=False) + "\n")
+
+
+def write_results_csv(out: TextIO, results: list[INDEXED_RESULT]) -> None:
+    writer = csv.writer(out)
+    writer.writerow(INDEXED_RESULT._fields)
+    writer.writerows(results)
@@ -1,6 +1,8 @@
 import re
 from abc import ABC, abstractmethod
-from typing import Literal, NamedTuple
+from typing import Any, Literal, NamedTuple, Sequence
+
+BATCH_SEPARATOR = "\x00\n"  # messages are cleaned of null characters, and the newline lets ^ match the start of each message
 
 
 class RESULT(NamedTuple):
@@ -34,6 +36,22 @@ class Game(ABC):
     def analyse_message(self, message: str) -> None | RESULT:
         pass  # pragma: no cover
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        # literal text every message of this game starts with, empty if the game can't express one
+        return ()
+
+    def analyse_batch(self, messages: Sequence[str], buffer: str | None = None) -> list[tuple[int, RESULT]]:
+        # (index of the message, result) for each message of this game, buffer is the messages joined with join_batch
+        prefixes = self.get_prefixes()
+        results: list[tuple[int, RESULT]] = []
+        for i, message in enumerate(messages):
+            if prefixes and not message.startswith(prefixes):
+                continue
+            result = self.analyse_message(message)
+            if result is not None:
+                results.append((i, result))
+        return results
+
     @property
     def range(self) -> int:
         return 0 if self._min == self._BIG_INTEGER else self._max - self._min
@@ -42,28 +60,155 @@ class Game(ABC):
         self._min = min(self._min, game_number)
         self._max = max(self._max, game_number)
 
+    def merge(self, other: "Game") -> None:
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    def get_state(self) -> list[int]:
+        return [self._min, self._max]
+
+    def load_state(self, state: list[int]) -> None:
+        self._min, self._max = state
+
+
+class RegexGame(Game):
+    # a game read entirely from a match of its regex, so a whole batch can be matched in one pass
+    # a game that reads messages its own way overrides analyse_message of Game instead
+    def __init__(self) -> None:
+        super().__init__()
+        self._batch_regex = re.compile(f"{BATCH_SEPARATOR}(?:{self._get_regex()})", re.MULTILINE)
+
+    @abstractmethod
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
+        pass  # pragma: no cover
+
+    def analyse_message(self, message: str) -> RESULT | None:
+        matches = self._regex.match(message)
+        if matches is None:
+            return None
+        return self._get_result(matches)
+
+    def analyse_batch(self, messages: Sequence[str], buffer: str | None = None) -> list[tuple[int, RESULT]]:
+        if buffer is None:
+            buffer = join_batch(messages)
+
+        results: list[tuple[int, RESULT]] = []
+        index, position = -1, 0
+        for matches in self._batch_regex.finditer(buffer):
+            index += buffer.count("\x00", position, matches.start() + 1)  # messages between this match and the last
+            position = matches.start() + 1
+            result = self._get_result(matches)
+            if result is not None:
+                results.append((index, result))
+        return results
+
+
+def join_batch(messages: Sequence[str]) -> str:
+    return BATCH_SEPARATOR + BATCH_SEPARATOR.join(messages)
+
+
+MAX_BITSET_SPAN = 4_096  # game numbers further apart than this are kept in sets, e.g. a mistyped or made up number
+
 
 class GameScore:
+    # game numbers are dense, so they are kept as bits of an int offset by the lowest game number seen
     def __init__(self) -> None:
-        self._games: set[int] = set()
-        self._fails: set[int] = set()
+        self._offset = 0
+        self._games = 0
+        self._fails = 0
+        self._sparse: tuple[set[int], set[int]] | None = None  # (games, fails) once the numbers are too far apart for bits
         self._total_guesses = 0
 
+    def _span(self, low: int, high: int) -> int:
+        # from the lowest to the highest of low, high and the game numbers kept
+        bits = self._games | self._fails
+        if bits:
+            low, high = min(low, self._offset), max(high, self._offset + bits.bit_length() - 1)
+        return high - low
+
+    def _align(self, game_number: int) -> None:
+        # move the offset down to game_number, if it is lower
+        if not self._games and not self._fails:
+            self._offset = game_number
+        elif game_number < self._offset:
+            shift = self._offset - game_number
+            self._games <<= shift
+            self._fails <<= shift
+            self._offset = game_number
+
+    def _numbers(self, bits: int) -> list[int]:
+        numbers: list[int] = []
+        while bits:
+            lowest = bits & -bits
+            numbers.append(self._offset + lowest.bit_length() - 1)
+            bits ^= lowest
+        return numbers
+
+    def _game_numbers(self) -> tuple[list[int], list[int]]:
+        if self._sparse is not None:
+            return sorted(self._sparse[0]), sorted(self._sparse[1])
+        return self._numbers(self._games), self._numbers(self._fails)
+
+    def _mark(self, game_number: int, completed: bool) -> None:
+        if self._sparse is None and self._span(game_number, game_number) >= MAX_BITSET_SPAN:
+            self._sparse = (set(self._numbers(self._games)), set(self._numbers(self._fails)))
+            self._games = self._fails = 0
+        if self._sparse is not None:
+            self._sparse[0 if completed else 1].add(game_number)
+            return
+
+        self._align(game_number)
+        bit = 1 << (game_number - self._offset)
+        if completed:
+            self._games |= bit
+        else:
+            self._fails |= bit
+
     def add(self, _result: RESULT) -> None:
+        self._mark(_result.game_number, _result.completed)
         if _result.completed:
-            self._games.add(_result.game_number)
             self._total_guesses += _result.guesses
-        else:
-            self._fails.add(_result.game_number)
+
+    def merge(self, other: "GameScore") -> None:
+        self._total_guesses += other._total_guesses
+        other_bits = other._games | other._fails
+        if self._sparse is None and other._sparse is None:
+            if not other_bits:
+                return
+            if self._span(other._offset, other._offset + other_bits.bit_length() - 1) < MAX_BITSET_SPAN:
+                self._align(other._offset)  # line up with the lower of the two offsets
+                shift = other._offset - self._offset
+                self._games |= other._games << shift
+                self._fails |= other._fails << shift
+                return
+
+        games, fails = other._game_numbers()
+        for game_number in games:
+            self._mark(game_number, True)
+        for game_number in fails:
+            self._mark(game_number, False)
+
+    def get_state(self) -> dict[str, Any]:
+        games, fails = self._game_numbers()
+        return {"games": games, "fails": fails, "total_guesses": self._total_guesses}
+
+    def load_state(self, state: dict[str, Any]) -> None:
+        self._games = self._fails = 0
+        self._sparse = None
+        for game_number in state["games"]:
+            self._mark(game_number, True)
+        for game_number in state["fails"]:
+            self._mark(game_number, False)
+        self._total_guesses = state["total_guesses"]
 
     @property
     def completed(self) -> int:
-        return len(self._games)
+        return len(self._sparse[0]) if self._sparse is not None else self._games.bit_count()
 
     @property
     def attempts(self) -> int:
-        return self.completed + len(self._fails)
+        return self.completed + (len(self._sparse[1]) if self._sparse is not None else self._fails.bit_count())
 
     @property
     def average_guesses(self) -> float | Literal[0]:
-        return 0 if len(self._games) == 0 else self._total_guesses / len(self._games)
+        return 0 if not self.completed else self._total_guesses / self.completed
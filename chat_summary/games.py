@@ -1,25 +1,25 @@
 import datetime
+import functools
 import re
 
 
-from chat_summary.game import RESULT, Game
+from chat_summary.game import RESULT, Game, RegexGame
 
 
-class Wordle(Game):
+class Wordle(RegexGame):
     def get_display_emojis(self) -> str:
         return "🟨⬛🟩"
 
     def get_score_title(self) -> str:
         return "GUESSES"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Wordle ",)
+
     def _get_regex(self) -> str:
         return r"^Wordle (\d{1,3}(?:,\d{3})*|\d{1,4}) (1|2|3|4|5|6|X)/6"
 
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
-
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         number = int(matches[1].replace(",", ""))
         self._update_range(number)
 
@@ -30,51 +30,58 @@ class Wordle(Game):
         return RESULT(number, True, guesses)
 
 
-class Connections(Game):
+CONNECTIONS_SQUARES = ("🟪", "🟦", "🟩", "🟨")
+
+
+class Connections(RegexGame):
     def get_display_emojis(self) -> str:
         return "🟪🟦🟩"
 
     def get_score_title(self) -> str:
         return "GUESSES"
 
-    def _get_regex(self) -> str:
-        return r"^Connections \nPuzzle #(\d{1,4})"
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Connections ",)
 
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
+    def _get_regex(self) -> str:
+        return r"^Connections \nPuzzle #(\d{1,4})([^\x00]*)"
 
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         number = int(matches[1])
         self._update_range(number)
 
-        lines = message.split("\n")
-        try:
-            last_line, i = next((line, i) for i, line in enumerate(reversed(lines)) if line and line[0] in ("🟪", "🟦", "🟩", "🟨"))
-        except StopIteration:
-            return None
-
+        # scan back from the end for the last row of the grid, without splitting the message into lines
+        grid = matches[2]
+        end = len(grid)
+        while True:
+            start = grid.rfind("\n", 0, end) + 1
+            if start == 0:  # back on the puzzle number's line
+                return None
+            if start != end and grid[start] in CONNECTIONS_SQUARES:
+                break
+            end = start - 1
+
+        last_line = grid[start:end]
         if all(square == last_line[0] for square in last_line):
-            return RESULT(number, True, len(lines) - 2 - i)
+            return RESULT(number, True, grid.count("\n", 0, start))  # one guess per row up to the last
 
         return RESULT(number, False)
 
 
-class Nerdle(Game):
+class Nerdle(RegexGame):
     def get_display_emojis(self) -> str:
         return "⬛🟪🟩"
 
     def get_score_title(self) -> str:
         return "GUESSES"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("nerdlegame ",)
+
     def _get_regex(self) -> str:
         return r"^nerdlegame (\d{1,4}) (1|2|3|4|5|6|X)/6"
 
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
-
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         number = int(matches[1])
         self._update_range(number)
 
@@ -85,79 +92,87 @@ class Nerdle(Game):
         return RESULT(number, True, guesses)
 
 
-class Strands(Game):
+class Strands(RegexGame):
     def get_display_emojis(self) -> str:
         return "🟡💡🔵"
 
     def get_score_title(self) -> str:
         return "HINTS USED"
 
-    def _get_regex(self) -> str:
-        return r"^Strands #(\d{1,4})"
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Strands #",)
 
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
+    def _get_regex(self) -> str:
+        return r"^Strands #(\d{1,4})([^\x00]*)"
 
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         number = int(matches[1])
         self._update_range(number)
 
-        score = message.count("💡")
+        score = matches[2].count("💡")
 
         return RESULT(number, True, score)
 
 
-class Mini(Game):
+MINI_EPOCH = datetime.date(2014, 8, 21)  # the first Mini, so a puzzle's number is the days since then
+
+
+@functools.cache  # a chat's results share a few thousand dates at most, so each is only parsed once
+def _get_mini_number(raw_date: str) -> int | None:
+    try:
+        if "/" in raw_date:
+            month, day, year = raw_date.split("/")
+            date = datetime.date(int(year), int(month), int(day))
+        else:
+            date = datetime.date.fromisoformat(raw_date)
+    except ValueError:
+        return None
+    return (date - MINI_EPOCH).days
+
+
+class Mini(RegexGame):
     def get_display_emojis(self) -> str:
         return "⬜️🔷⬛️"
 
     def get_score_title(self) -> str:
         return "TIME (S)"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("https://www.nytimes.com/badges/games/mini.html?d=", "I solved the ")
+
     def _get_regex(self) -> str:
         return r"^https://www.nytimes.com/badges/games/mini.html\?d=(\d{4}-\d{2}-\d{2})&t=(\d{1,5})|^I solved the (\d{1,2}/\d{1,2}/\d{4}) New York Times Mini Crossword in (\d{1,2}:\d{1,2})!"
 
-    def _days_since_last(self, date: datetime.datetime) -> int:
-        return (datetime.datetime.now() - date).days
-
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
-
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         if matches[3] is not None:
             mins, secs = matches[4].split(":")
             time_taken = int(mins) * 60 + int(secs)
-            raw_date = matches[3]
-            if raw_date[1] == "/":
-                raw_date = "0" + raw_date
-            date = datetime.datetime.strptime(raw_date, "%m/%d/%Y")
+            number = _get_mini_number(matches[3])
         else:
             time_taken = int(matches[2])
-            date = datetime.datetime.strptime(matches[1], "%Y-%m-%d")
+            number = _get_mini_number(matches[1])
 
-        days_since_last = self._days_since_last(date)
-        self._update_range(days_since_last)
+        if number is None:
+            return None
+        self._update_range(number)
 
-        return RESULT(days_since_last, True, time_taken)
+        return RESULT(number, True, time_taken)
 
 
-class Betweenle(Game):
+class Betweenle(RegexGame):
     def get_display_emojis(self) -> str:
         return "🟩🏆⬜"
 
     def get_score_title(self) -> str:
         return "TROPHIES LOST"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Betweenle ",)
+
     def _get_regex(self) -> str:
         return r"^Betweenle (\d{1,4}) - (1|2|3|4|5|X)/5"
 
-    def analyse_message(self, message: str) -> RESULT | None:
-        matches = re.match(self._regex, message)
-        if matches is None:
-            return None
-
+    def _get_result(self, matches: re.Match[str]) -> RESULT | None:
         number = int(matches[1])
         self._update_range(number)
 
@@ -166,3 +181,6 @@ class Betweenle(Game):
         trophies_lost = 5 - int(matches[2])
 
         return RESULT(number, True, trophies_lost)
+
+
+BUILTIN_GAMES: tuple[type[Game], ...] = (Betweenle, Connections, Mini, Nerdle, Strands, Wordle)
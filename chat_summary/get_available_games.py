@@ -1,19 +1,26 @@
-from typing import Generator
+from importlib.metadata import entry_points
+from typing import Callable
 
-import chat_summary.games as chat_games
 from chat_summary.game import Game
+from chat_summary.games import BUILTIN_GAMES
 
+ENTRY_POINT_GROUP = "chat_summary.games"  # third party games register a Game subclass under this group
 
-def get_available_chat_games() -> Generator[tuple[str, Game], None, None]:
-    for name in dir(chat_games):
-        module = eval(f"chat_games.{name}")
-        if not isinstance(module, type):
-            continue
 
-        try:
-            obj = module()
-        except TypeError:
-            continue
+def _builtin_loader(game: type[Game]) -> Callable[[], type[Game]]:
+    return lambda: game
 
-        if isinstance(obj, Game) and type(obj) != Game:
-            yield name, obj
+
+def get_available_chat_games() -> dict[str, Callable[[], type[Game]]]:
+    # game name -> loader of its class, plugins are only imported once they're selected
+    games: dict[str, Callable[[], type[Game]]] = {game.__name__: _builtin_loader(game) for game in BUILTIN_GAMES}
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        games.setdefault(entry_point.name, entry_point.load)
+
+    return dict(sorted(games.items()))
+
+
+def load_chat_games(available: dict[str, Callable[[], type[Game]]], names: list[str]) -> list[Game]:
+    games = [available[name]()() for name in set(names)]
+    games.sort(key=lambda game: type(game).__name__)
+    return games
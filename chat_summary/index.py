@@ -0,0 +1,103 @@
+import sqlite3
+import sys
+from typing import NamedTuple
+
+from chat_summary.chat import ChatSummary, normalise_handle
+from chat_summary.read_messages import connect_read_only
+
+INDEX_VERSION = 1  # an index of another version is rebuilt, as its game numbers may differ
+APPLE_EPOCH_SECONDS = 978_307_200  # 2001-01-01 in unix time
+INDEX_SCHEMA = """
+CREATE TABLE result (
+    chat TEXT NOT NULL,
+    game TEXT NOT NULL,
+    member TEXT NOT NULL,
+    handle TEXT NOT NULL,
+    game_number INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    guesses INTEGER NOT NULL,
+    message_rowid INTEGER NOT NULL,
+    date INTEGER NOT NULL,
+    UNIQUE (chat, game, handle, game_number)
+);
+CREATE INDEX result_idx_game_member_number ON result (game, member, game_number);
+CREATE INDEX result_idx_game_handle_number ON result (game, handle, game_number);
+"""
+
+
+class INDEXED_RESULT(NamedTuple):
+    chat: str
+    game: str
+    member: str
+    handle: str  # normalised, "" for the user
+    game_number: int
+    completed: bool
+    guesses: int
+    message_rowid: int
+    date: int  # unix time the message was sent
+
+
+class ResultIndex:
+    def __init__(self, path: str, read_only: bool = False) -> None:
+        # only a writer creates or rebuilds the schema, a reader never changes the file, which may not be an index at all
+        try:
+            self._connection = connect_read_only(path) if read_only else sqlite3.connect(path)
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if read_only:
+                has_results = self._connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'result'").fetchone() is not None
+                if version != INDEX_VERSION or not has_results:
+                    self._connection.close()
+                    raise sqlite3.DatabaseError
+            elif version != INDEX_VERSION:
+                self._connection.executescript(f"DROP TABLE IF EXISTS result; {INDEX_SCHEMA} PRAGMA user_version = {INDEX_VERSION};")
+        except sqlite3.DatabaseError:
+            print("unable to open result index, ensure it is a file written by --index", file=sys.stderr)
+            exit(1)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add(self, chat_name: str, chat_summary: ChatSummary, after: dict[str, int] | None = None) -> int:
+        # the first result of a member for each game number is kept, as it is in the summary
+        # after is the results of each game already added from this summary, so they aren't read again
+        results = chat_summary.results
+        if results is None:
+            return 0
+
+        members = chat_summary.members
+        rows = (
+            (
+                chat_name,
+                record.game,
+                members[record.member_id].name,
+                normalise_handle(members[record.member_id].number),
+                record.game_number,
+                record.completed,
+                record.guesses,
+                record.rowid,
+                record.date // 1_000_000_000 + APPLE_EPOCH_SECONDS,
+            )
+            for record in results.get_records(after)
+        )
+        with self._connection:
+            changes = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO result VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._connection.total_changes - changes
+
+    def query(self, chat: str | None = None, game: str | None = None, member: str | None = None, game_number: int | None = None) -> list[INDEXED_RESULT]:
+        # each given field narrows the results, a member is matched by name or handle
+        filters: list[str] = []
+        params: list[object] = []
+        for column, value in (("chat", chat), ("game", game), ("game_number", game_number)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        if member is not None:
+            filters.append("(member = ? OR handle = ?)")
+            params.extend((member, normalise_handle(member)))
+
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        rows: list[tuple[str, str, str, str, int, int, int, int, int]] = self._connection.execute(f"SELECT * FROM result {where} ORDER BY chat, game, game_number, member", params).fetchall()
+        return [
+            INDEXED_RESULT(chat_name, game_name, name, handle, number, bool(completed), guesses, rowid, date) for chat_name, game_name, name, handle, number, completed, guesses, rowid, date in rows
+        ]
@@ -1,31 +1,45 @@
 import os
 import sqlite3
 import sys
-from typing import Generator, cast
+from typing import Generator
 
-import pandas
-from pandas import DataFrame, Series
-
-from chat_summary.chat import MESSAGE, ChatMember
-from chat_summary.read_messages import get_chat_mapping, read_messages
+from chat_summary.chat import CHAT, MESSAGE, ChatMember, normalise_handle
+from chat_summary.profiler import profile_stage
+from chat_summary.read_messages import DEFAULT_BATCH_SIZE, MessageFilter, connect_read_only, merge_messages, read_messages
 
 
 class MessagesDB:
-    def __init__(self, user: str, chat_name: str, silence_contact_error: bool) -> None:
+    def __init__(
+        self,
+        user: str,
+        chat_names: list[str] | None,
+        silence_contact_error: bool,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chat_paths: list[str] | None = None,
+        addressbook_path: str | None = None,
+    ) -> None:
         self._user = user
-        self._chat_name = chat_name
+        self._chat_names = chat_names  # None for every named chat
+        self._batch_size = batch_size
+        self._contacts: dict[str, str] | None = None
+        self._contacts_loaded = False
         self._display_name = user
         self.silence_contact_error = silence_contact_error
-        self._chat_path = f"/Users/{user}/Library/Messages/chat.db"
-
-        users = os.listdir("/Users")
-        if user not in users:
-            potential_users = ", ".join(f"'{user}'" for user in users if not user.startswith("."))
-            print(f"user not found, user should be one of: {potential_users}", file=sys.stderr)
-            exit(1)
+        self._chat_paths = chat_paths or [f"/Users/{user}/Library/Messages/chat.db"]  # copies of the same history are merged
+        self._addressbook_path = addressbook_path
+        self._chat_ids: tuple[str, ...] = ()  # of the last chats read, to watch for new messages
+        self._message_filter = MessageFilter()
+
+        if chat_paths is None:  # the user's own messages are read, so they must exist on this mac
+            users = os.listdir("/Users")
+            if user not in users:
+                potential_users = ", ".join(f"'{user}'" for user in users if not user.startswith("."))
+                print(f"user not found, user should be one of: {potential_users}", file=sys.stderr)
+                exit(1)
 
         try:
-            self._connection = sqlite3.connect(self._chat_path)
+            with profile_stage("open database"):
+                self._connections = [connect_read_only(chat_path) for chat_path in self._chat_paths]  # each shared by every query on its database
 
         except sqlite3.OperationalError:
             print("could not connect to messages database, ensure you have the right permissions to access file", file=sys.stderr)
@@ -34,29 +48,42 @@ class MessagesDB:
             print("could not find stored messages, ensure you have signed in and uploaded iMessages to iCloud", file=sys.stderr)
             exit(1)
 
-    def _select_chat_rowid(self) -> int:
-        chats = pandas.read_sql_query(  # pyright: ignore[reportUnknownMemberType]
-            f"""
-            SELECT
-                ROWID, display_name
-            FROM
-                chat
-            WHERE
-               display_name != ""
-            """,
-            self._connection,
-        )
-
-        rows: Series[int] = chats["ROWID"]
-        chat_names: Series[str] = chats["display_name"]
-        try:
-            return next(row_id for row_id, name in zip(rows, chat_names) if name == self._chat_name)  # type: ignore[no-any-return]
-        except StopIteration:
-            potential_chats = ", ".join(set(f"'{name}'" for name in chat_names))
-            print(f"chat name not found, should be one of: {potential_chats}", file=sys.stderr)
-            exit(1)
+    def _select_chats(self) -> dict[str, list[tuple[sqlite3.Connection, int, str]]]:
+        named_chats: dict[str, list[tuple[sqlite3.Connection, int, str]]] = {}  # chat name -> (database, chat rowid, room name) for each database it is in
+        for connection in self._connections:
+            chats: list[tuple[int, str, str]] = connection.execute(
+                """
+                SELECT
+                    ROWID, display_name, room_name
+                FROM
+                    chat
+                WHERE
+                   display_name != ""
+                """
+            ).fetchall()
+
+            database_chats: dict[str, tuple[sqlite3.Connection, int, str]] = {}
+            for row_id, name, room_name in chats:
+                database_chats.setdefault(name, (connection, row_id, room_name))
+            for name, chat in database_chats.items():
+                named_chats.setdefault(name, []).append(chat)
+
+        if self._chat_names is None:
+            return named_chats
+
+        selected_chats: dict[str, list[tuple[sqlite3.Connection, int, str]]] = {}
+        for chat_name in self._chat_names:
+            if chat_name not in named_chats:
+                potential_chats = ", ".join(f"'{name}'" for name in named_chats)
+                print(f"chat name not found, should be one of: {potential_chats}", file=sys.stderr)
+                exit(1)
+            selected_chats[chat_name] = named_chats[chat_name]
+        return selected_chats
 
     def _get_addressbook_db_path(self) -> str:
+        if self._addressbook_path is not None:
+            return self._addressbook_path
+
         address_source_path = f"/Users/{self._user}/Library/Application Support/AddressBook/Sources"  # base path
         for dir in os.listdir(address_source_path):
             if not dir.count("."):  # go one step in each folder
@@ -66,9 +93,23 @@ class MessagesDB:
                             return f"{address_source_path}/{dir}/{file}"
         raise FileNotFoundError
 
-    def _get_chat_members(self, chat_id: int) -> list[ChatMember]:
-        numbers: Series[str] = pandas.read_sql_query(  # pyright: ignore[reportUnknownMemberType]
-            f"""
+    def get_contacts_version(self) -> tuple[float, int, float, int] | None:
+        # changes whenever the contacts do, without reading them, as (mtime, size) of the database and then of its write-ahead log
+        # edits only reach the database itself when the log is checkpointed, until then they change just the -wal file
+        try:
+            path = self._get_addressbook_db_path()
+            database = os.stat(path)
+        except OSError:
+            return None
+        try:
+            wal = os.stat(f"{path}-wal")
+        except OSError:
+            return database.st_mtime, database.st_size, 0, 0
+        return database.st_mtime, database.st_size, wal.st_mtime, wal.st_size
+
+    def _get_chat_members(self, connection: sqlite3.Connection, chat_id: int) -> list[ChatMember]:
+        handles: list[tuple[str]] = connection.execute(
+            """
             SELECT
                 id
             FROM
@@ -78,21 +119,34 @@ class MessagesDB:
                 ON
                     c.handle_id = h.ROWID
             WHERE
-                chat_id = {chat_id}
+                chat_id = ?
             """,
-            self._connection,
-        )[
-            "id"
-        ]  # get all numbers in a chat
-
-        # connect to contacts
-        address_path: str
-        all_contacts = DataFrame()
+            (chat_id,),
+        ).fetchall()
+        numbers = [number for number, in handles]  # get all numbers in a chat
+
+        if not self._contacts_loaded:  # the contacts are shared by every chat
+            with profile_stage("load contacts"):
+                self._contacts = self._get_contacts()
+            self._contacts_loaded = True
+            if self._contacts is None and not self.silence_contact_error:
+                print("unable to find contacts", file=sys.stderr)
+
+        contacts = self._contacts
+        if contacts is None:  # contact info was not able to be found
+            return [ChatMember(number, number) for number in numbers] + [ChatMember(self._user, "")]
+
+        # if we did not find a contact, set the contact name to just the number
+        chat_members = [ChatMember(contacts.get(normalise_handle(number), number), number) for number in numbers]
+        chat_members.append(ChatMember(self._display_name, self._user))
+        return chat_members
+
+    def _get_contacts(self) -> dict[str, str] | None:
         try:
             address_path = self._get_addressbook_db_path()
-            contacts_connection = sqlite3.connect(address_path)
+            contacts_connection = connect_read_only(address_path)
 
-            all_contacts = pandas.read_sql_query(  # pyright: ignore[reportUnknownMemberType]
+            all_contacts: list[tuple[str | None, str | None, str | None, str | None]] = contacts_connection.execute(
                 """
                 SELECT
                     zfirstname, zlastname, zfullnumber, zaddress
@@ -106,49 +160,67 @@ class MessagesDB:
                         zabcdemailaddress e
                     ON
                         r.z_pk = e.zowner
-                """,
-                contacts_connection,
-            )  # get all contacts
+                """
+            ).fetchall()  # get all contacts
             contacts_connection.close()
-        except (FileNotFoundError, sqlite3.OperationalError):  # contact info was not able to be found
-            if not self.silence_contact_error:
-                print("unable to find contacts", file=sys.stderr)
-            return [ChatMember(number, number) for number in numbers] + [ChatMember(self._user, "")]
-
-        chat_members: list[ChatMember] = []
-
-        for number in numbers:
-            for i in range(len(all_contacts)):
-                first, last, contact_number, email = cast(tuple[str, str, str, str], all_contacts.iloc[i, :])  # retrieve data from all contacts
-                contact_number = "".join([n for n in contact_number if n != " "])  # remove spaces
-                if contact_number[0] == "0":  # replace 0 at start with +61
-                    contact_number = "+61" + contact_number[1:]
-
-                name = first or "" + " " + last or ""  # combine first and last names
-                name = ("".join(n for n in name if n.isalnum() or n == " ")).strip()  # clean up
-
-                if number == contact_number:  # add a found user and break
-                    chat_members.append(ChatMember(name, number))
-                    break
-
-                if email == number:  # add a found user and break
-                    chat_members.append(ChatMember(name, number))
-                    break
-
-            else:  # if we did not find a contact, set the contact name to just the number
-                chat_members.append(ChatMember(number, number))
-
-        chat_members.append(ChatMember(self._display_name, self._user))
-        return chat_members
-
-    def _get_messages(self, chat_id: str) -> Generator[MESSAGE, None, None]:
-        messages = read_messages(self._chat_path, chat_id, self._user)
-        for message in messages:
-            yield MESSAGE(message["body"], message["phone_number"])
-
-    def get_messages_members_from_chat(self) -> tuple[Generator[MESSAGE, None, None], list[ChatMember]]:
-        chat_id = get_chat_mapping(self._chat_path, self._chat_name)
-        rowid = self._select_chat_rowid()
-        members = self._get_chat_members(rowid)
-        messages = self._get_messages(chat_id)
-        return messages, members
+        except (FileNotFoundError, sqlite3.OperationalError):
+            return None
+
+        contacts: dict[str, str] = {}  # normalised phone number or email -> name
+        for first, last, contact_number, email in all_contacts:
+            name = f"{first or ''} {last or ''}"  # combine first and last names
+            name = ("".join(n for n in name if n.isalnum() or n == " ")).strip()  # clean up
+
+            # earlier contacts take precedence over later ones with the same number or email
+            if contact_number:
+                contacts.setdefault(normalise_handle(contact_number), name)
+            if email:
+                contacts.setdefault(normalise_handle(email), name)
+
+        return contacts
+
+    def _get_member_handles(self, members: list[ChatMember], requested: tuple[str, ...]) -> tuple[str, ...]:
+        handles: list[str] = []
+        for name_or_handle in requested:
+            try:
+                member = next(member for member in members if name_or_handle == member.name or normalise_handle(name_or_handle) == normalise_handle(member.number))
+            except StopIteration:
+                potential_members = ", ".join(f"'{member.name}'" for member in members)
+                print(f"member not found, should be one of: {potential_members}", file=sys.stderr)
+                exit(1)
+
+            handles.append(member.number or self._user)  # the user's messages are read under their login name
+        return tuple(handles)
+
+    def _get_messages(self, chat_ids: tuple[str, ...], message_filter: MessageFilter) -> Generator[MESSAGE, None, None]:
+        sources = [read_messages(connection, chat_ids, self._user, message_filter, self._batch_size) for connection in self._connections]
+        return merge_messages(sources, self._batch_size)
+
+    def get_messages_members_from_chats(self, message_filter: MessageFilter = MessageFilter()) -> tuple[Generator[MESSAGE, None, None], dict[str, CHAT]]:
+        # the messages of every chat are read in one pass of each database, ordered by ROWID and tagged with their chat id
+        with profile_stage("select chats"):
+            selected_chats = self._select_chats()
+
+        chats: dict[str, CHAT] = {}
+        with profile_stage("chat members"):
+            for chat_name, copies in selected_chats.items():
+                chat_members: dict[str, ChatMember] = {}  # a member may only be in some copies of the chat
+                for connection, row_id, _ in copies:
+                    for member in self._get_chat_members(connection, row_id):
+                        chat_members.setdefault(member.number, member)
+                chats[copies[0][2]] = CHAT(chat_name, list(chat_members.values()))  # a chat keeps its room name across copies of the database
+
+        if message_filter.handles is not None:  # members may be given by name or handle
+            members = [member for chat in chats.values() for member in chat.members]
+            message_filter = message_filter._replace(handles=self._get_member_handles(members, message_filter.handles))
+        self._chat_ids, self._message_filter = tuple(chats), message_filter
+        messages = self._get_messages(self._chat_ids, message_filter)
+        return messages, chats
+
+    def get_last_rowid(self) -> int:
+        # cheap enough to poll, the ROWID is the primary key
+        return max(connection.execute("SELECT max(ROWID) FROM message").fetchone()[0] or 0 for connection in self._connections)
+
+    def get_new_messages(self, after_rowid: int) -> Generator[MESSAGE, None, None]:
+        # the messages since after_rowid of the chats last read, with the same filter
+        return self._get_messages(self._chat_ids, self._message_filter._replace(after_rowid=after_rowid))
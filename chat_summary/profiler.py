@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any, Iterator
+
+
+class StageStats:
+    def __init__(self) -> None:
+        self.nanoseconds = 0
+        self.calls = 0
+        self.rows = 0
+
+
+class Profiler:
+    def __init__(self, trace_memory: bool = False) -> None:
+        self._start = time.perf_counter_ns()
+        self._stages: dict[str, StageStats] = {}
+        self._games: dict[str, list[int]] = {}  # game name -> [matched, rejected]
+        self._events: list[dict[str, Any]] = []  # chrome trace events
+        self._trace_memory = trace_memory
+        self._nanoseconds = 0  # of the whole run, once stopped
+        self._peak_memory = 0
+        if trace_memory:  # slows every allocation down, so the times are less accurate
+            tracemalloc.start()
+
+    def add(self, name: str, start: int, end: int, rows: int = 0) -> None:
+        self.add_time(name, end - start, rows)
+        self._events.append({"name": name, "ph": "X", "ts": (start - self._start) / 1_000, "dur": (end - start) / 1_000, "pid": os.getpid(), "tid": threading.get_ident(), "args": {"rows": rows}})
+
+    def add_time(self, name: str, nanoseconds: int, rows: int = 0) -> None:
+        # for work that happens in too many small pieces to trace each of them
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = StageStats()
+        stats.nanoseconds += nanoseconds
+        stats.calls += 1
+        stats.rows += rows
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter_ns())
+
+    def count_game(self, game_name: str, matched: bool) -> None:
+        counts = self._games.setdefault(game_name, [0, 0])
+        counts[0 if matched else 1] += 1
+
+    def stop(self) -> None:
+        self._nanoseconds = time.perf_counter_ns() - self._start
+        if self._trace_memory:
+            self._peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def get_report(self) -> str:
+        out = io.StringIO()
+        name_length = max((len(name) for name in (*self._stages, *self._games)), default=0)
+        out.write(f"\n{'STAGE':<{name_length}}  {'TIME (ms)':>10}  {'CALLS':>8}  {'ROWS':>10}\n")
+        for name, stats in self._stages.items():
+            out.write(f"{name:<{name_length}}  {stats.nanoseconds / 1_000_000:>10.2f}  {stats.calls:>8}  {stats.rows:>10}\n")
+
+        if self._games:
+            out.write(f"\n{'GAME':<{name_length}}  {'MATCHED':>10}  {'REJECTED':>8}\n")
+            for name, (matched, rejected) in sorted(self._games.items()):
+                out.write(f"{name:<{name_length}}  {matched:>10}  {rejected:>8}\n")
+
+        out.write(f"\nTOTAL {self._nanoseconds / 1_000_000:.2f} ms\n")
+        if self._trace_memory:
+            out.write(f"PEAK MEMORY {self._peak_memory / 1_024:.0f} KiB\n")
+        return out.getvalue()
+
+    def write_trace(self, path: str) -> None:
+        # open with chrome://tracing or https://ui.perfetto.dev
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, file)
+
+
+_profiler: Profiler | None = None  # only set while a run is being profiled
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+def start_profiler(trace_memory: bool = False) -> Profiler:
+    global _profiler
+    _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def stop_profiler() -> None:
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+    _profiler = None
+
+
+def profile_stage(name: str) -> AbstractContextManager[None]:
+    return nullcontext() if _profiler is None else _profiler.stage(name)
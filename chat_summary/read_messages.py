@@ -1,52 +1,187 @@
+import datetime
+import pathlib
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
+from typing import Generator, Iterator, NamedTuple, Sequence
 
+from chat_summary.chat import MESSAGE
+from chat_summary.profiler import get_profiler
+from chat_summary.typedstream import decode_attributed_body
 
-def read_messages(db_location: str, chat_id: str, self_number: str = "Me") -> list[dict[str, str]]:
-    with sqlite3.connect(db_location) as conn:
-        cursor = conn.cursor()
+DEFAULT_BATCH_SIZE = 1_000
+READ_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB, read pages straight from the page cache instead of through read()
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA temp_store = MEMORY",
+)
+APPLE_EPOCH = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
 
+
+class MessageFilter(NamedTuple):
+    after_rowid: int = 0
+    prefixes: tuple[str, ...] | None = None  # None reads messages of any content
+    since: datetime.date | None = None  # inclusive
+    until: datetime.date | None = None  # inclusive
+    handles: tuple[str, ...] | None = None  # None reads messages from any sender
+
+
+def connect_read_only(db_location: str) -> sqlite3.Connection:
+    # messages may be read on another thread than the one that connected when merging databases
+    # the path is escaped, as any '#', '?' or '%' in it would otherwise be read as part of the uri
+    connection = sqlite3.connect(f"{pathlib.Path(db_location).absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    for pragma in READ_PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+def _to_apple_time(date: datetime.date) -> int:
+    # message.date is stored as nanoseconds since 2001-01-01, dates are taken as local midnight
+    local_midnight = datetime.datetime(date.year, date.month, date.day).astimezone()
+    return (local_midnight - APPLE_EPOCH) // datetime.timedelta(microseconds=1) * 1_000
+
+
+def _get_prefix_filter(prefixes: tuple[str, ...] | None) -> tuple[str, list[str | bytes]]:
+    if prefixes is None:  # can't tell which messages are games, read all of them
+        return "", []
+    if not prefixes:
+        return "AND 0", []
+
+    escaped = (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for prefix in prefixes)
+    text_filter = " OR ".join("message.text LIKE ? ESCAPE '\\'" for _ in prefixes)
+    body_filter = " OR ".join("instr(message.attributedBody, ?) > 0" for _ in prefixes)
+
+    params: list[str | bytes] = [*escaped, *(prefix.encode() for prefix in prefixes)]
+    return f"AND ({text_filter} OR (message.text IS NULL AND ({body_filter})))", params
+
+
+def _get_filter(message_filter: MessageFilter, self_number: str) -> tuple[str, list[object]]:
+    # discard messages that can't be a game in sqlite rather than in python
+    prefix_filter, prefix_params = _get_prefix_filter(message_filter.prefixes)
+    filters = ["message.ROWID > ?", prefix_filter]
+    params: list[object] = [message_filter.after_rowid, *prefix_params]
+
+    if message_filter.since is not None:
+        filters.append("AND message.date >= ?")
+        params.append(_to_apple_time(message_filter.since))
+    if message_filter.until is not None:
+        filters.append("AND message.date < ?")
+        params.append(_to_apple_time(message_filter.until + datetime.timedelta(days=1)))
+
+    if message_filter.handles is not None:
+        placeholders = ", ".join("?" for _ in message_filter.handles)
+        handle_filter = f"message.handle_id IN (SELECT ROWID FROM handle WHERE id IN ({placeholders}))"
+        if self_number in message_filter.handles:  # the user's messages have no handle
+            handle_filter += " OR message.handle_id = 0"
+        filters.append(f"AND ({handle_filter})")
+        params.extend(message_filter.handles)
+
+    return " ".join(clause for clause in filters if clause), params
+
+
+def read_messages(
+    connection: sqlite3.Connection, chat_ids: tuple[str, ...], self_number: str = "Me", message_filter: MessageFilter = MessageFilter(), batch_size: int = DEFAULT_BATCH_SIZE
+) -> Generator[MESSAGE, None, None]:
+    cursor = connection.cursor()
+    try:
+        filters, params = _get_filter(message_filter, self_number)
         query = f"""\
-            SELECT message.text, message.attributedBody, handle.id
+            SELECT message.ROWID, message.text, message.attributedBody, handle.id, message.cache_roomnames, message.guid, message.date
             FROM message
             LEFT JOIN handle ON message.handle_id = handle.ROWID
-            WHERE message.cache_roomnames == ?
+            WHERE message.cache_roomnames IN ({", ".join("?" for _ in chat_ids)}) AND {filters}
+            ORDER BY message.ROWID
         """
 
-        results = cursor.execute(query, (chat_id,)).fetchall()
-        messages: list[dict[str, str]] = []
+        profiler = get_profiler()  # looked up once, so reading costs nothing extra when not profiling
+        start = time.perf_counter_ns()
+        cursor.execute(query, (*chat_ids, *params))
+        if profiler is not None:
+            profiler.add("query", start, time.perf_counter_ns())
 
-        for result in results:
-            text, attributed_body, handle_id = result
+        body_prefixes = None if message_filter.prefixes is None else tuple(prefix.encode() for prefix in message_filter.prefixes)
+        while True:
+            start = time.perf_counter_ns()
+            results = cursor.fetchmany(batch_size)  # only hold one batch of rows in memory at a time
+            if profiler is not None:
+                profiler.add("fetch rows", start, time.perf_counter_ns(), len(results))
+            if not results:
+                break
 
-            if handle_id is None:
-                phone_number = self_number
-            else:
-                phone_number = handle_id
+            for rowid, text, attributed_body, handle_id, chat_id, guid, date in results:
+                if handle_id is None:
+                    phone_number = self_number
+                else:
+                    phone_number = handle_id
 
-            if text is not None:
-                body = text
-            elif attributed_body is None:
-                continue
-            else:
-                attributed_body = attributed_body.decode("utf-8", errors="replace")
+                if text is not None:
+                    body = text
+                elif attributed_body is None:
+                    continue
+                elif profiler is None:
+                    decoded = decode_attributed_body(attributed_body, body_prefixes)
+                    if decoded is None:
+                        continue
+                    body = decoded
+                else:
+                    start = time.perf_counter_ns()
+                    decoded = decode_attributed_body(attributed_body, body_prefixes)
+                    profiler.add_time("decode attributedBody", time.perf_counter_ns() - start, 1)
+                    if decoded is None:
+                        continue
+                    body = decoded
+
+                yield MESSAGE(body, phone_number, rowid, chat_id, guid, date)
+    finally:
+        cursor.close()
 
-                if "NSNumber" in str(attributed_body):
-                    attributed_body = str(attributed_body).split("NSNumber")[0]
-                    if "NSString" in attributed_body:
-                        attributed_body = str(attributed_body).split("NSString")[1]
-                        if "NSDictionary" in attributed_body:
-                            attributed_body = str(attributed_body).split("NSDictionary")[0]
-                            attributed_body = attributed_body[6:-12]
-                            body = attributed_body
 
-            messages.append({"body": body, "phone_number": phone_number})  # type: ignore
+def merge_messages(sources: Sequence[Iterator[MESSAGE]], queue_size: int = DEFAULT_BATCH_SIZE) -> Generator[MESSAGE, None, None]:
+    # read every source on its own thread, keeping only the first copy of a message seen in any of them
+    if len(sources) == 1:
+        yield from sources[0]
+        return
 
-        return messages
+    queue: Queue[MESSAGE | BaseException | None] = Queue(queue_size)
+    stop = threading.Event()
+
+    def put(item: MESSAGE | BaseException | None) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
 
+    def read(source: Iterator[MESSAGE]) -> None:
+        try:
+            for message in source:
+                if not put(message):
+                    return
+        except BaseException as error:
+            put(error)
+        else:
+            put(None)  # source is exhausted
 
-def get_chat_mapping(db_location: str, chat_name: str) -> str:
-    with sqlite3.connect(db_location) as conn:
-        cursor = conn.cursor()
-        result: tuple[str] = cursor.execute("SELECT room_name FROM chat where display_name == ?", (chat_name,)).fetchone()
+    seen: set[str] = set()
+    with ThreadPoolExecutor(len(sources)) as executor:
+        for source in sources:
+            executor.submit(read, source)
 
-    return result[0]
+        try:
+            remaining = len(sources)
+            while remaining:
+                item = queue.get()
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                elif item.guid not in seen:
+                    seen.add(item.guid)
+                    yield item
+        finally:
+            stop.set()  # let blocked readers finish if we stopped before they did
@@ -0,0 +1,136 @@
+import sys
+from array import array
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple
+
+from chat_summary.game import RESULT
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+STATS_PERCENTILES = (10, 90)
+
+
+class GuessStats(NamedTuple):
+    games: int  # completed games the stats are over
+    median: float
+    std: float
+    percentiles: tuple[float, ...]  # one for each of the requested percentiles
+
+
+class RESULT_RECORD(NamedTuple):
+    game: str
+    member_id: int
+    game_number: int
+    completed: bool
+    guesses: int
+    rowid: int
+    date: int  # nanoseconds since 2001-01-01
+
+
+def _import_numpy() -> ModuleType:
+    # numpy is only needed for the statistics, so importing the package stays fast without it
+    try:
+        import numpy
+    except ImportError:
+        print("numpy is required for statistics, install it with 'pip install chat-summary[stats]'", file=sys.stderr)
+        exit(1)
+    return numpy
+
+
+class ResultColumns:
+    # one compact column per field rather than a RESULT object per message
+    def __init__(self) -> None:
+        self.member_ids = array("l")
+        self.game_numbers = array("l")
+        self.completed = array("b")
+        self.guesses = array("l")
+        self.rowids = array("q")  # of the message each result is from
+        self.dates = array("q")
+
+    def __len__(self) -> int:
+        return len(self.member_ids)
+
+    def append(self, member_id: int, result: RESULT, rowid: int = 0, date: int = 0) -> None:
+        self.member_ids.append(member_id)
+        self.game_numbers.append(result.game_number)
+        self.completed.append(result.completed)
+        self.guesses.append(result.guesses)
+        self.rowids.append(rowid)
+        self.dates.append(date)
+
+    def extend(self, other: "ResultColumns") -> None:
+        self.member_ids.extend(other.member_ids)
+        self.game_numbers.extend(other.game_numbers)
+        self.completed.extend(other.completed)
+        self.guesses.extend(other.guesses)
+        self.rowids.extend(other.rowids)
+        self.dates.extend(other.dates)
+
+
+class ResultStore:
+    def __init__(self, game_names: list[str]) -> None:
+        self._columns = {name: ResultColumns() for name in game_names}
+
+    def add(self, game_name: str, member_id: int, result: RESULT, rowid: int = 0, date: int = 0) -> None:
+        self._columns[game_name].append(member_id, result, rowid, date)
+
+    def merge(self, other: "ResultStore") -> None:
+        for name, columns in other._columns.items():
+            self._columns[name].extend(columns)
+
+    def get_counts(self) -> dict[str, int]:
+        return {name: len(columns) for name, columns in self._columns.items()}
+
+    def get_records(self, after: dict[str, int] | None = None) -> Iterator[RESULT_RECORD]:
+        # every result one at a time, without numpy, after skips that many of each game's first results
+        for game_name, columns in self._columns.items():
+            start = after.get(game_name, 0) if after else 0
+            rows = zip(columns.member_ids[start:], columns.game_numbers[start:], columns.completed[start:], columns.guesses[start:], columns.rowids[start:], columns.dates[start:])
+            for member_id, game_number, completed, guesses, rowid, date in rows:
+                yield RESULT_RECORD(game_name, member_id, game_number, bool(completed), guesses, rowid, date)
+
+    def get_columns(self, game_name: str) -> "dict[str, npt.NDArray[Any]]":
+        np = _import_numpy()
+        columns = self._columns[game_name]
+        return {
+            "member_id": np.asarray(columns.member_ids, dtype=np.int64),
+            "game_number": np.asarray(columns.game_numbers, dtype=np.int64),
+            "completed": np.asarray(columns.completed, dtype=np.bool_),
+            "guesses": np.asarray(columns.guesses, dtype=np.int64),
+            "rowid": np.asarray(columns.rowids, dtype=np.int64),
+            "date": np.asarray(columns.dates, dtype=np.int64),
+        }
+
+    def _completed_guesses(self, game_name: str) -> "tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]":
+        # guesses of completed games grouped by member, as (member ids, start of each member's group, guesses)
+        np = _import_numpy()
+        columns = self.get_columns(game_name)
+        completed = columns["completed"]
+        member_ids, guesses = columns["member_id"][completed], columns["guesses"][completed]
+        order = np.argsort(member_ids, kind="stable")
+        member_ids, guesses = member_ids[order], guesses[order]
+        unique_ids, starts = np.unique(member_ids, return_index=True)
+        return unique_ids, starts, guesses
+
+    def get_guess_stats(self, game_name: str, percentiles: tuple[int, ...] = STATS_PERCENTILES) -> dict[int, GuessStats]:
+        np = _import_numpy()
+        unique_ids, starts, guesses = self._completed_guesses(game_name)
+
+        stats: dict[int, GuessStats] = {}
+        for member_id, member_guesses in zip(unique_ids.tolist(), np.split(guesses, starts[1:])):
+            quantiles = np.percentile(member_guesses, [50, *percentiles])
+            stats[member_id] = GuessStats(len(member_guesses), float(quantiles[0]), float(member_guesses.std()), tuple(float(quantile) for quantile in quantiles[1:]))
+        return stats
+
+    def get_guess_distribution(self, game_name: str) -> dict[int, dict[int, int]]:
+        # member id -> guesses -> amount of completed games with that many guesses
+        np = _import_numpy()
+        unique_ids, starts, guesses = self._completed_guesses(game_name)
+
+        distributions: dict[int, dict[int, int]] = {}
+        for member_id, member_guesses in zip(unique_ids.tolist(), np.split(guesses, starts[1:])):
+            values, counts = np.unique(member_guesses, return_counts=True)
+            distributions[member_id] = dict(zip(values.tolist(), counts.tolist()))
+        return distributions
@@ -1,15 +1,105 @@
 import subprocess
 import sys
+from typing import TYPE_CHECKING, Callable, NamedTuple
 
+if TYPE_CHECKING:
+    import asyncio
 
-def send_message(chat_name: str, message: str) -> None:
+MAX_MESSAGE_LENGTH = 4_000  # characters sent in one message, longer summaries are split
+DEFAULT_CONCURRENCY = 4  # messages being sent at a time
+
+SEND_COMMAND = Callable[[str, str], list[str]]  # (chat name, message) -> the command that sends it
+
+
+class SEND_RESULT(NamedTuple):
+    chat_name: str
+    sent: int  # chunks of the message sent
+    chunks: int
+    error: str = ""  # why the rest weren't sent
+
+
+def escape_applescript(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def osascript_command(chat_name: str, message: str) -> list[str]:
+    return ["osascript", "-e", f'tell application "Messages"\nsend "{escape_applescript(message)}" to chat "{escape_applescript(chat_name)}"\n end tell']
+
+
+def program_command(program: list[str]) -> SEND_COMMAND:
+    # any program that takes the chat name and message as its last two arguments, e.g. a stub to test sending without Messages
+    return lambda chat_name, message: [*program, chat_name, message]
+
+
+def split_message(message: str, max_length: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    # split between lines where possible, so the rankings stay readable
+    chunks: list[str] = []
+    lines: list[str] = []
+    length = -1  # of the lines joined by newlines
+    for line in message.split("\n"):
+        if lines and length + 1 + len(line) > max_length:
+            chunks.append("\n".join(lines))
+            lines, length = [], -1
+        while len(line) > max_length:  # only a line longer than a whole message is split within it
+            chunks.append(line[:max_length])
+            line = line[max_length:]
+        lines.append(line)
+        length += 1 + len(line)
+    chunks.append("\n".join(lines))
+    return [chunk.strip("\n") for chunk in chunks if chunk.strip()]
+
+
+async def _send_chat(chat_name: str, message: str, command: SEND_COMMAND, semaphore: "asyncio.Semaphore", max_length: int) -> SEND_RESULT:
+    import asyncio
+
+    if message == "":
+        return SEND_RESULT(chat_name, 0, 0, "empty message, no message sent")
+
+    chunks = split_message(message, max_length)
+    for sent, chunk in enumerate(chunks):
+        args = command(chat_name, chunk)
+        async with semaphore:  # each chat's chunks are sent in order, while other chats are sent alongside them
+            try:
+                process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                _, stderr = await process.communicate()
+            except OSError as error:
+                return SEND_RESULT(chat_name, sent, len(chunks), str(error))
+        if process.returncode != 0:
+            return SEND_RESULT(chat_name, sent, len(chunks), stderr.decode(errors="replace").strip() or f"exited with status {process.returncode}")
+    return SEND_RESULT(chat_name, len(chunks), len(chunks))
+
+
+async def send_messages_async(messages: dict[str, str], command: SEND_COMMAND | None = None, concurrency: int = DEFAULT_CONCURRENCY, max_length: int = MAX_MESSAGE_LENGTH) -> list[SEND_RESULT]:
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+    sends = (_send_chat(chat_name, message, command or osascript_command, semaphore, max_length) for chat_name, message in messages.items())
+    return list(await asyncio.gather(*sends))
+
+
+def send_messages(messages: dict[str, str], command: SEND_COMMAND | None = None, concurrency: int = DEFAULT_CONCURRENCY, max_length: int = MAX_MESSAGE_LENGTH) -> list[SEND_RESULT]:
+    # a chat that fails doesn't stop the others being sent
+    import asyncio  # slow to import, and only needed to send
+
+    return asyncio.run(send_messages_async(messages, command, concurrency, max_length))
+
+
+def report_results(results: list[SEND_RESULT]) -> bool:
+    for chat_name, sent, chunks, error in results:
+        if error:
+            print(f"unable to send message to '{chat_name}' ({sent}/{chunks} parts sent): {error}", file=sys.stderr)
+        else:
+            print(f"message sent successfully to '{chat_name}'!")
+    return all(not result.error for result in results)
+
+
+def send_message(chat_name: str, message: str, command: SEND_COMMAND | None = None) -> None:
     if message == "":
         print("empty message, no message sent", file=sys.stderr)
         exit(1)
 
-    try:
-        subprocess.check_call(["osascript", "-e", f'tell application "Messages"\nsend "{message}" to chat "{chat_name}"\n end tell'])
-    except subprocess.CalledProcessError:
+    (result,) = send_messages({chat_name: message}, command)
+    if result.error:
         print(f"unable to send message to group chat", file=sys.stderr)
         exit(1)
 
@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+from typing import Any
+
+from chat_summary.chat import ChatSummary
+
+STATE_VERSION = 2  # 2: Mini numbers are days since its first puzzle rather than days before today
+
+
+def read_state(path: str, chat_name: str, game_names: list[str]) -> dict[str, Any] | None:
+    try:
+        with open(path, encoding="utf-8") as file:
+            state: dict[str, Any] = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        print("unable to read state file, rebuilding summary", file=sys.stderr)
+        return None
+
+    # a state saved for a different chat or selection of games can't be continued from
+    if state.get("version") != STATE_VERSION or state.get("chat") != chat_name or state.get("games") != game_names:
+        return None
+
+    return state
+
+
+def write_state(path: str, chat_name: str, game_names: list[str], chat_summary: ChatSummary) -> None:
+    state = {"version": STATE_VERSION, "chat": chat_name, "games": game_names, **chat_summary.get_state()}
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(temp_path, path)  # never leave a half written state behind
@@ -0,0 +1,48 @@
+_NSSTRING = b"NSString"
+_STRING_TYPE = b"\x84\x01+"  # the string's type signature, followed by its length and utf-8 bytes
+_SHORT_INT = 0x81  # length is the next 2 bytes
+_INT = 0x82  # length is the next 4 bytes
+
+
+def _find_string(attributed_body: bytes) -> tuple[int, int] | None:
+    start = attributed_body.find(_NSSTRING)
+    if start == -1:
+        return None
+    start = attributed_body.find(_STRING_TYPE, start + len(_NSSTRING))
+    if start == -1:
+        return None
+    start += len(_STRING_TYPE)
+
+    try:
+        length = attributed_body[start]
+    except IndexError:
+        return None
+
+    if length == _SHORT_INT:
+        length = int.from_bytes(attributed_body[start + 1 : start + 3], "little")
+        start += 3
+    elif length == _INT:
+        length = int.from_bytes(attributed_body[start + 1 : start + 5], "little")
+        start += 5
+    else:
+        start += 1
+
+    if start + length > len(attributed_body):
+        return None
+    return start, length
+
+
+def decode_attributed_body(attributed_body: bytes, prefixes: tuple[bytes, ...] | None = None) -> str | None:
+    # read the NSString out of a typedstream encoded message.attributedBody, None if the blob has no text or doesn't start with one of the prefixes
+    string = _find_string(attributed_body)
+    if string is None:
+        return None
+
+    start, length = string
+    if prefixes is not None and not attributed_body.startswith(prefixes, start):  # reject before decoding
+        return None
+
+    try:
+        return attributed_body[start : start + length].decode("utf-8")
+    except UnicodeDecodeError:
+        return None
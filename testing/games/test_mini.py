@@ -0,0 +1,40 @@
+import pytest
+
+from chat_summary.games import Mini
+
+
+@pytest.fixture
+def mini_game():
+    return Mini()
+
+
+@pytest.mark.parametrize(
+    ("message", "expected"),
+    (
+        ("https://www.nytimes.com/badges/games/mini.html?d=2014-08-21&t=32", (0, True, 32)),
+        ("https://www.nytimes.com/badges/games/mini.html?d=2024-01-02&t=120", (3421, True, 120)),
+        ("I solved the 1/2/2024 New York Times Mini Crossword in 0:32!", (3421, True, 32)),
+        ("I solved the 12/25/2023 New York Times Mini Crossword in 1:05!", (3413, True, 65)),
+    ),
+)
+def test_valid_message(message: str, expected: tuple[int, bool, int], mini_game: Mini):
+    assert mini_game.analyse_message(message) == expected
+
+
+@pytest.mark.parametrize(
+    "message",
+    (
+        "I solved the 13/45/2024 New York Times Mini Crossword in 0:32!",
+        "https://www.nytimes.com/badges/games/mini.html?d=2024-02-30&t=32",
+        "I solved the puzzle",
+        "https://www.nytimes.com/badges/games/mini.html?d=yesterday",
+    ),
+)
+def test_invalid_message(message: str, mini_game: Mini):
+    assert mini_game.analyse_message(message) is None
+
+
+def test_range(mini_game: Mini):
+    mini_game.analyse_message("I solved the 1/2/2024 New York Times Mini Crossword in 0:32!")
+    mini_game.analyse_message("https://www.nytimes.com/badges/games/mini.html?d=2024-01-09&t=32")
+    assert mini_game.range == 7
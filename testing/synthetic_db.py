@@ -0,0 +1,153 @@
+import argparse
+import datetime
+import random
+import sqlite3
+from itertools import islice
+from typing import Callable, Iterator
+
+INSERT_BATCH_SIZE = 10_000
+DAY_NANOSECONDS = 86_400 * 1_000_000_000
+START_DATE = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+APPLE_EPOCH = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
+
+# the parts of the real schemas that the summary reads, with the same names and indices
+CHAT_SCHEMA = """
+CREATE TABLE handle (ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE, id TEXT NOT NULL, country TEXT, service TEXT NOT NULL, uncanonicalized_id TEXT);
+CREATE TABLE chat (ROWID INTEGER PRIMARY KEY AUTOINCREMENT, guid TEXT UNIQUE NOT NULL, style INTEGER, state INTEGER, chat_identifier TEXT, service_name TEXT, room_name TEXT, display_name TEXT);
+CREATE TABLE chat_handle_join (chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE, handle_id INTEGER REFERENCES handle (ROWID) ON DELETE CASCADE, UNIQUE(chat_id, handle_id));
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT, guid TEXT UNIQUE NOT NULL, text TEXT, handle_id INTEGER DEFAULT 0, service TEXT, date INTEGER,
+    is_from_me INTEGER DEFAULT 0, cache_roomnames TEXT, attributedBody BLOB
+);
+CREATE TABLE chat_message_join (chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE, message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE, message_date INTEGER DEFAULT 0, PRIMARY KEY (chat_id, message_id));
+CREATE INDEX message_idx_handle ON message(handle_id, date);
+CREATE INDEX message_idx_date ON message(date);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id ON chat_message_join(chat_id, message_date, message_id);
+"""
+ADDRESSBOOK_SCHEMA = """
+CREATE TABLE ZABCDRECORD (Z_PK INTEGER PRIMARY KEY, ZFIRSTNAME VARCHAR, ZLASTNAME VARCHAR);
+CREATE TABLE ZABCDPHONENUMBER (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZFULLNUMBER VARCHAR);
+CREATE TABLE ZABCDEMAILADDRESS (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZADDRESS VARCHAR);
+CREATE INDEX ZABCDPHONENUMBER_ZOWNER_INDEX ON ZABCDPHONENUMBER (ZOWNER);
+CREATE INDEX ZABCDEMAILADDRESS_ZOWNER_INDEX ON ZABCDEMAILADDRESS (ZOWNER);
+"""
+
+
+def _mini_message(day: int, rng: random.Random) -> str:
+    # the Mini is shared as a link or as a sentence, both dated rather than numbered
+    date = START_DATE + datetime.timedelta(days=day)
+    seconds = rng.randint(20, 600)
+    if rng.random() < 0.5:
+        return f"https://www.nytimes.com/badges/games/mini.html?d={date:%Y-%m-%d}&t={seconds}&c=synthetic"
+    return f"I solved the {date.month}/{date.day}/{date.year} New York Times Mini Crossword in {seconds // 60}:{seconds % 60:02d}!"
+
+
+GAME_MESSAGES: tuple[Callable[[int, random.Random], str], ...] = (
+    lambda day, rng: f"Wordle {day + 200:,} {rng.choice('123456X')}/6\n\n⬛🟨⬛⬛⬛\n🟩🟩🟩🟩🟩",
+    lambda day, rng: f"nerdlegame {day + 300} {rng.choice('123456X')}/6\n\n🟩🟪⬛⬛🟪🟩⬛🟩\n🟩🟩🟩🟩🟩🟩🟩🟩",
+    lambda day, rng: f"Connections \nPuzzle #{day + 1}\n" + "🟨🟦🟨🟨\n" * rng.randint(0, 3) + "🟪🟪🟪🟪" * rng.randint(0, 1) + rng.choice(("\n🟩🟩🟩🟩", "\n🟩🟨🟩🟩")),
+    lambda day, rng: f"Strands #{day + 1}\n“Synthetic”\n" + rng.choice(("🔵🔵🔵🟡", "💡🔵🔵🟡", "💡💡🔵🟡")),
+    lambda day, rng: f"Betweenle {day + 100} - {rng.choice('12345X')}/5\n\n🟩🟩🟩⬜⬜",
+    _mini_message,
+)
+OTHER_MESSAGES = ("hello", "see you tonight", "😂😂😂", "did anyone get today's wordle?", "Wordle is so hard today", "on my way", "https://example.com/article", "ok")
+
+
+def make_attributed_body(text: str) -> bytes:
+    encoded = text.encode()
+    if len(encoded) < 0x80:
+        length = bytes([len(encoded)])
+    elif len(encoded) < 0x10000:
+        length = b"\x81" + len(encoded).to_bytes(2, "little")
+    else:
+        length = b"\x82" + len(encoded).to_bytes(4, "little")
+    return (
+        b"\x04\x0bstreamtyped\x81\xe8\x03\x84\x01@\x84\x84\x84\x12NSAttributedString\x00\x84\x84\x08NSObject\x00\x85\x92\x84\x84\x84\x08NSString\x01\x94\x84\x01+"
+        + length
+        + encoded
+        + b"\x86\x84\x02iI\x01\x05\x92\x84\x84\x84\x0cNSDictionary\x00\x94\x84\x01i\x01\x92\x84\x96\x96\x1d__kIMMessagePartAttributeName\x86\x92\x84\x84\x84\x08NSNumber\x00\x84\x84\x07NSValue\x00\x94\x84\x01*\x84\x99\x99\x00\x86\x86\x86"
+    )
+
+
+def get_handles(members: int) -> list[str]:
+    # a mix of phone numbers and emails, as iMessage stores them
+    return [f"member{i}@example.com" if i % 5 == 4 else f"+614{i:08d}" for i in range(members)]
+
+
+def get_room_names(chats: int) -> list[str]:
+    return [f"chat{i:018d}" for i in range(chats)]
+
+
+def _message_rows(messages: int, members: int, chats: int, game_ratio: float, attributed_ratio: float, rng: random.Random) -> Iterator[tuple[tuple[object, ...], tuple[int, int, int]]]:
+    # (message row, chat_message_join row)
+    room_names = get_room_names(chats)
+    start = (START_DATE - APPLE_EPOCH) // datetime.timedelta(microseconds=1) * 1_000
+    step = max(DAY_NANOSECONDS * 365 * 2 // max(messages, 1), 1)  # spread the messages over two years
+    for rowid in range(1, messages + 1):
+        date = start + rowid * step
+        if rng.random() < game_ratio:
+            text = rng.choice(GAME_MESSAGES)((date - start) // DAY_NANOSECONDS, rng)
+        else:
+            text = rng.choice(OTHER_MESSAGES)
+
+        handle_id = rng.randint(0, members)  # 0 is a message sent by the user
+        attributed = rng.random() < attributed_ratio  # newer versions of macOS only fill in attributedBody
+        chat_id = rng.randint(1, chats)
+        body = make_attributed_body(text) if attributed else None
+        message = (rowid, f"SYNTHETIC-{rowid:012d}", None if attributed else text, handle_id, "iMessage", date, int(handle_id == 0), room_names[chat_id - 1], body)
+        yield message, (chat_id, rowid, date)
+
+
+def create_chat_db(path: str, messages: int = 10_000, members: int = 8, chats: int = 1, game_ratio: float = 0.3, attributed_ratio: float = 0.5, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    handles = get_handles(members)
+    room_names = get_room_names(chats)
+
+    with sqlite3.connect(path) as connection:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(CHAT_SCHEMA)
+        connection.executemany("INSERT INTO handle VALUES (?, ?, 'au', 'iMessage', ?)", ((i, handle, handle) for i, handle in enumerate(handles, start=1)))
+        connection.executemany(
+            "INSERT INTO chat VALUES (?, ?, 43, 3, ?, 'iMessage', ?, ?)", ((i, f"iMessage;+;{room_name}", room_name, room_name, f"Chat {i}") for i, room_name in enumerate(room_names, start=1))
+        )
+        connection.executemany("INSERT INTO chat_handle_join VALUES (?, ?)", ((chat_id, handle_id) for chat_id in range(1, chats + 1) for handle_id in range(1, members + 1)))
+
+        rows = _message_rows(messages, members, chats, game_ratio, attributed_ratio, rng)
+        while batch := list(islice(rows, INSERT_BATCH_SIZE)):
+            connection.executemany("INSERT INTO message VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (message for message, _ in batch))
+            connection.executemany("INSERT INTO chat_message_join VALUES (?, ?, ?)", (join for _, join in batch))
+    connection.close()
+
+
+def create_addressbook_db(path: str, members: int = 8) -> None:
+    # contacts are stored the way they were typed in, which isn't how iMessage stores the handle
+    with sqlite3.connect(path) as connection:
+        connection.executescript(ADDRESSBOOK_SCHEMA)
+        for i, handle in enumerate(get_handles(members), start=1):
+            connection.execute("INSERT INTO ZABCDRECORD VALUES (?, ?, ?)", (i, f"Member{i}", "Synthetic"))
+            connection.execute("INSERT INTO ZABCDPHONENUMBER VALUES (?, ?, ?)", (i, i, f"04{i:02d} {i:03d} {i:03d}" if "@" in handle else f"0{handle[3:6]} {handle[6:9]} {handle[9:]}"))
+            if "@" in handle:
+                connection.execute("INSERT INTO ZABCDEMAILADDRESS VALUES (?, ?, ?)", (i, i, handle.upper()))
+    connection.close()
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description="create a synthetic chat.db (and AddressBook) to run or benchmark chat-summary against")
+    argparser.add_argument("path", help="where to create the chat.db")
+    argparser.add_argument("--messages", type=int, default=10_000)
+    argparser.add_argument("--members", type=int, default=8)
+    argparser.add_argument("--chats", type=int, default=1)
+    argparser.add_argument("--game-ratio", type=float, default=0.3, help="fraction of messages that are game results")
+    argparser.add_argument("--attributed-ratio", type=float, default=0.5, help="fraction of messages only stored in attributedBody")
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--addressbook", help="where to create a matching AddressBook .abcddb")
+    args = argparser.parse_args()
+
+    create_chat_db(args.path, args.messages, args.members, args.chats, args.game_ratio, args.attributed_ratio, args.seed)
+    if args.addressbook:
+        create_addressbook_db(args.addressbook, args.members)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from chat_summary.cache import CACHED_OUTPUT, SummaryCache, get_cache_dir, get_cache_key
+
+
+def test_cache_roundtrip(tmp_path: Path):
+    cache = SummaryCache(f"{tmp_path}/cache")
+    assert cache.get("key") is None
+    cache.put("key", CACHED_OUTPUT("summary 🟩", "no 'Wordle' messages found\n"))
+    assert cache.get("key") == CACHED_OUTPUT("summary 🟩", "no 'Wordle' messages found\n")
+    assert cache.get("other") is None
+
+
+def test_cache_corrupt(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    cache = SummaryCache(str(tmp_path))
+    (tmp_path / "key.json").write_text("{", encoding="utf-8")
+    assert cache.get("key") is None
+    assert capsys.readouterr().err == "unable to read summary cache, rendering summary\n"
+
+
+def test_cache_max_age(tmp_path: Path):
+    cache = SummaryCache(str(tmp_path), max_age=60)
+    cache.put("old", CACHED_OUTPUT("old", ""))
+    old = time.time() - 120
+    os.utime(tmp_path / "old.json", (old, old))
+    assert cache.get("old") is None
+
+    cache.put("new", CACHED_OUTPUT("new", ""))
+    assert not (tmp_path / "old.json").exists()
+    assert cache.get("new") is not None
+
+
+def test_cache_max_bytes(tmp_path: Path):
+    for i, key in enumerate(("a", "b", "c")):
+        SummaryCache(str(tmp_path)).put(key, CACHED_OUTPUT(key * 30, ""))
+        used = time.time() - 10 + i
+        os.utime(tmp_path / f"{key}.json", (used, used))
+
+    cache = SummaryCache(str(tmp_path), max_bytes=130)  # room for two entries
+    cache.get("a")  # used most recently, so kept over b and c
+    cache.put("d", CACHED_OUTPUT("d" * 30, ""))
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["a.json", "d.json"]
+
+
+def test_get_cache_key():
+    fields = {"chats": ["chat"], "games": ["Wordle"], "last_rowid": 10, "contacts_version": (1.5, 4096, 0, 0)}
+    assert get_cache_key(fields) == get_cache_key(dict(reversed(fields.items())))
+    assert get_cache_key(fields) != get_cache_key({**fields, "last_rowid": 11})
+    assert get_cache_key(fields) != get_cache_key({**fields, "contacts_version": (1.5, 4096, 2.5, 8272)})
+
+
+def test_get_cache_dir(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", "/cache")
+    assert get_cache_dir() == "/cache/chat-summary"
@@ -1,34 +1,67 @@
+import datetime
 import io
-import subprocess
-from typing import Any
+import json
+import sys
+from pathlib import Path
 
 import pytest
-from chat_summary.chat import MESSAGE, ChatMember
+from chat_summary.chat import CHAT, MESSAGE, ChatMember, ChatSummary
 
 from chat_summary.chat_summary import main
+from chat_summary.games import Wordle
+from chat_summary.profiler import get_profiler
+from chat_summary.read_messages import MessageFilter
+from chat_summary.results import ResultStore
+from chat_summary.send_message import osascript_command
 
 
 class MockMessagesDB:
-    def __init__(self, user: str, chat_name: str, silence: bool, give_values: bool) -> None:
+    ALL_CHATS = ["chat1", "chat2", "chat3"]
+
+    def __init__(
+        self, user: str, chat_names: list[str] | None, silence: bool, give_values: bool, batch_size: int = 0, chat_paths: list[str] | None = None, addressbook_path: str | None = None
+    ) -> None:
         self.user = user
-        self.chat_name = chat_name
+        self.addressbook_path = addressbook_path
+        self.batch_size = batch_size
+        self.chat_paths = chat_paths
+        self.chat_names = chat_names
         self.silence = silence
-        self.messages = [MESSAGE("Wordle 612 4/6", "12345"), MESSAGE("Wordle 613 4/6", "12345")] if give_values else []
-        self.members = [ChatMember("name", "12345")] if give_values else []
+        self.give_values = give_values
+        self.new_messages: list[MESSAGE] = []  # added while watching
+
+    def get_messages_members_from_chats(self, message_filter: MessageFilter = MessageFilter()) -> tuple[list[MESSAGE], dict[str, CHAT]]:
+        self.message_filter = message_filter
+        self.messages_read = True
+        chats: dict[str, CHAT] = {}
+        messages: list[MESSAGE] = []
+        for i, chat_name in enumerate(self.chat_names or self.ALL_CHATS):
+            chat_id = f"room{i}"
+            chats[chat_id] = CHAT(chat_name, [ChatMember("name", "12345")] if self.give_values else [])
+            if self.give_values:
+                messages += [MESSAGE("Wordle 612 4/6", "12345", 2 * i + 1, chat_id), MESSAGE("Wordle 613 4/6", "12345", 2 * i + 2, chat_id)]
+
+        return [message for message in messages if message.rowid > message_filter.after_rowid], chats
+
+    def get_last_rowid(self) -> int:
+        return max((message.rowid for message in self.new_messages), default=2)
 
-    def get_messages_members_from_chat(self) -> tuple[list[Any], list[Any]]:
-        return self.messages, self.members
+    def get_contacts_version(self) -> tuple[float, int, float, int] | None:
+        return None
+
+    def get_new_messages(self, after_rowid: int) -> list[MESSAGE]:
+        return [message for message in self.new_messages if message.rowid > after_rowid]
 
 
 @pytest.fixture
 def mock_messagesdb(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest):
     value: dict[str, MockMessagesDB] = {}
 
-    def mock(user: str, chat_name: str, silence: bool):
+    def mock(user: str, chat_names: list[str] | None, silence: bool, batch_size: int, chat_paths: list[str] | None, addressbook_path: str | None):
         try:
-            obj = MockMessagesDB(user, chat_name, silence, request.param)
+            obj = MockMessagesDB(user, chat_names, silence, request.param, batch_size, chat_paths, addressbook_path)
         except AttributeError:
-            obj = MockMessagesDB(user, chat_name, silence, False)
+            obj = MockMessagesDB(user, chat_names, silence, False, batch_size, chat_paths, addressbook_path)
         value["obj"] = obj
         return obj
 
@@ -38,15 +71,14 @@ def mock_messagesdb(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequ
 
 
 @pytest.fixture
-def mock_check_call(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest) -> dict[str, list[str]]:
+def mock_osascript(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest) -> dict[str, list[str]]:
     buffer: dict[str, list[str]] = {"args": []}
 
-    def check_call(args: list[str]) -> None:
-        if request.param:
-            raise subprocess.CalledProcessError(1, "")
-        buffer["args"] += args
+    def command(chat_name: str, message: str) -> list[str]:
+        buffer["args"] += osascript_command(chat_name, message)
+        return [sys.executable, "-c", "exit(1)" if request.param else "pass"]  # runs anywhere, unlike osascript
 
-    monkeypatch.setattr(subprocess, "check_call", check_call)
+    monkeypatch.setattr("chat_summary.send_message.osascript_command", command)
 
     return buffer
 
@@ -62,13 +94,100 @@ def mock_check_call(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequ
         ("user1", "chat3", ["-W", "-C", "--Nerdle", "-N"]),
     ),
 )
-def test_chat_summary(user: str, chat_name: str, options: list[str], mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], mock_check_call: dict[str, list[str]]):
+def test_chat_summary(user: str, chat_name: str, options: list[str], mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], mock_osascript: dict[str, list[str]]):
     main([user, chat_name, *options])
     assert capsys.readouterr().err == "🟥 no 'Connections' messages found 🟥\n🟥 no 'Nerdle' messages found 🟥\n🟥 no 'Wordle' messages found 🟥\n"
-    assert mock_messagesdb["obj"].chat_name == chat_name
+    assert mock_messagesdb["obj"].chat_names == [chat_name]
     assert mock_messagesdb["obj"].user == user
     assert mock_messagesdb["obj"].silence == False
-    assert mock_check_call["args"] == []
+    assert mock_osascript["args"] == []
+
+
+@pytest.mark.parametrize(("options", "expected"), ((["--batch-size", "10"], 10), ([], 1_000)))
+def test_batch_size(options: list[str], expected: int, mock_messagesdb: dict[str, MockMessagesDB]):
+    main(["user", "chat_name", *options])
+    assert mock_messagesdb["obj"].batch_size == expected
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_format_json(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str]):
+    main(["user", "chat1", "chat2", "-W", "--format", "json"])
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["chat"] for line in lines] == ["chat1", "chat2"]
+    assert lines[0]["games"] == [
+        {"game": "Wordle", "days": 1, "members": [{"name": "name", "number": "12345", "completed": 2, "attempts": 2, "average_guesses": 4.0, "completion_rank": 1, "average_rank": 1}]}
+    ]
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_format_json_streams(mock_messagesdb: dict[str, MockMessagesDB], monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    path = f"{tmp_path}/summary.jsonl"
+    written: list[int] = []  # lines in the output when each chat is summarised
+    get_summaries = ChatSummary.get_summaries
+
+    def mock_get_summaries(self: ChatSummary):
+        written.append(len(Path(path).read_text(encoding="utf-8").splitlines()))
+        return get_summaries(self)
+
+    monkeypatch.setattr(ChatSummary, "get_summaries", mock_get_summaries)
+    main(["user", "chat1", "chat2", "-W", "--format", "json", "--output", path])
+    assert written == [0, 1]
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_format_csv_output(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], tmp_path: Path):
+    path = f"{tmp_path}/summary.csv"
+    main(["user", "chat1", "-W", "--format", "csv", "--output", path])
+    assert capsys.readouterr().out == ""
+    with open(path, encoding="utf-8") as file:
+        assert file.read() == "chat,game,days,name,number,completed,attempts,average_guesses,completion_rank,average_rank\nchat1,Wordle,1,name,12345,2,2,4.0,1,1\n"
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_text_output(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], tmp_path: Path):
+    path = f"{tmp_path}/summary.txt"
+    main(["user", "chat1", "-W", "--output", path])
+    with open(path, encoding="utf-8") as file:
+        assert "🟨⬛🟩 WORDLE 🟨⬛🟩" in file.read()
+
+
+@pytest.mark.parametrize("options", (["--format", "json"], ["--output", "summary.txt"]))
+def test_send_message_export(options: list[str], mock_messagesdb: dict[str, MockMessagesDB]):
+    with pytest.raises(SystemExit):
+        main(["user", "chat1", "--send-message", *options])
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_profile(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], tmp_path: Path):
+    main(["user", "chat_name", "-W", "--profile-trace", f"{tmp_path}/trace.json"])
+    err = capsys.readouterr().err
+    assert "read and parse messages" in err and "render" in err and "Wordle" in err
+    with open(f"{tmp_path}/trace.json", encoding="utf-8") as file:
+        assert "render" in [event["name"] for event in json.load(file)["traceEvents"]]
+    assert get_profiler() is None
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_stats(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str]):
+    main(["user", "chat_name", "-W", "--stats"])
+    assert capsys.readouterr().out.endswith("\nMEDIAN GUESSES (± STD DEV)\n1. name..4.0 ± 0.00\n\n")
+
+
+@pytest.mark.parametrize(("options", "expected"), ((["--database", "old.db", "--database", "new.db"], ["old.db", "new.db"]), ([], None)))
+def test_databases(options: list[str], expected: list[str] | None, mock_messagesdb: dict[str, MockMessagesDB]):
+    main(["user", "chat_name", *options])
+    assert mock_messagesdb["obj"].chat_paths == expected
+
+
+def test_addressbook(mock_messagesdb: dict[str, MockMessagesDB]):
+    main(["user", "chat_name", "--addressbook", "contacts.abcddb"])
+    assert mock_messagesdb["obj"].addressbook_path == "contacts.abcddb"
+
+
+@pytest.mark.parametrize(("options", "expected"), ((["-W", "-N"], ("nerdlegame ", "Wordle ")), ([], ())))
+def test_prefixes(options: list[str], expected: tuple[str, ...], mock_messagesdb: dict[str, MockMessagesDB]):
+    main(["user", "chat_name", *options])
+    assert mock_messagesdb["obj"].message_filter.prefixes == expected
 
 
 @pytest.mark.parametrize(("options", "expected"), ((["--silence-contacts"], True), ([], False)))
@@ -110,18 +229,222 @@ def test_different_combination_of_options(options: list[str], mock_messagesdb: d
     assert capsys.readouterr().err == expected_out_from_combination(options)
 
 
-@pytest.mark.parametrize(("mock_check_call", "mock_messagesdb"), [(False, True)], indirect=True)
-def test_send_message_confirm(mock_messagesdb: dict[str, MockMessagesDB], mock_check_call: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+@pytest.mark.parametrize(("mock_osascript", "mock_messagesdb"), [(False, True)], indirect=True)
+def test_send_message_confirm(mock_messagesdb: dict[str, MockMessagesDB], mock_osascript: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setattr("sys.stdin", io.StringIO("Y"))
     main(["user", "chat_name", "-W", "--send-message"])
     assert capsys.readouterr().out == "are you sure you want to send the message? (Y): message sent successfully!\n"
-    assert mock_check_call["args"]
-    assert "chat_name" in mock_check_call["args"][2]
+    assert mock_osascript["args"]
+    assert "chat_name" in mock_osascript["args"][2]
 
 
-@pytest.mark.parametrize("mock_check_call", [False], indirect=True)
-def test_send_message_decline(mock_messagesdb: dict[str, MockMessagesDB], mock_check_call: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+@pytest.mark.parametrize("mock_osascript", [False], indirect=True)
+def test_send_message_decline(mock_messagesdb: dict[str, MockMessagesDB], mock_osascript: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setattr("sys.stdin", io.StringIO("not Y"))
     main(["user", "chat_name", "-W", "--send-message"])
     assert capsys.readouterr().out == "are you sure you want to send the message? (Y): "
-    assert not mock_check_call["args"]
+    assert not mock_osascript["args"]
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_state_file(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], tmp_path: Path):
+    path = f"{tmp_path}/state.json"
+    main(["user", "chat_name", "-W", "--state-file", path])
+    first = capsys.readouterr().out
+    assert mock_messagesdb["obj"].message_filter.after_rowid == 0
+
+    main(["user", "chat_name", "-W", "--state-file", path])
+    assert mock_messagesdb["obj"].message_filter.after_rowid == 2
+    assert capsys.readouterr().out == first
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_watch(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+    arrivals = [
+        [],
+        [MESSAGE("hello", "12345", 3, "room0")],
+        [MESSAGE("Wordle 614 3/6", "12345", 4, "room0")],
+        [MESSAGE("Wordle 614 3/6", "12345", 4, "room0")],  # already read
+    ]
+
+    def sleep(seconds: float) -> None:
+        assert seconds == 0.5
+        if not arrivals:
+            raise KeyboardInterrupt
+        mock_messagesdb["obj"].new_messages += arrivals.pop(0)
+
+    monkeypatch.setattr("time.sleep", sleep)
+    assert main(["user", "chat_name", "-W", "-N", "--watch", "--watch-interval", "0.5"]) == 0
+    out, err = capsys.readouterr()
+    main(["user", "chat_name", "-W", "-N"])
+    before = capsys.readouterr().out
+    assert out.startswith(before) and out != before
+    assert out.count("WORDLE") == 2  # printed again only when the game result arrived
+    assert err.count("no 'Nerdle' messages found") == 2
+    assert "3" in out[len(before) :]
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_watch_index(mock_messagesdb: dict[str, MockMessagesDB], monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    arrivals = [[MESSAGE("Wordle 614 3/6", "12345", 4, "room0")], [MESSAGE("Wordle 615 4/6", "12345", 5, "room0")]]
+    records: list[int] = []  # read from the summary by each update of the index
+    get_records = ResultStore.get_records
+
+    def sleep(seconds: float) -> None:
+        if not arrivals:
+            raise KeyboardInterrupt
+        mock_messagesdb["obj"].new_messages += arrivals.pop(0)
+
+    def mock_get_records(self: ResultStore, after: dict[str, int] | None = None):
+        read = list(get_records(self, after))
+        records.append(len(read))
+        return iter(read)
+
+    monkeypatch.setattr("time.sleep", sleep)
+    monkeypatch.setattr(ResultStore, "get_records", mock_get_records)
+    path = f"{tmp_path}/index.db"
+    assert main(["user", "chat_name", "-W", "--watch", "--index", path]) == 0
+    assert records[1:] == [1, 1]  # only the new result, not the whole history again
+    assert main(["query", path, "--number", "615"]) == 0
+
+
+@pytest.mark.parametrize("options", (["--send-message"], ["--database", "a.db", "--database", "b.db"]))
+def test_invalid_watch(options: list[str], mock_messagesdb: dict[str, MockMessagesDB]):
+    with pytest.raises(SystemExit):
+        main(["user", "chat_name", "--watch", *options])
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_cache(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    options = ["user", "chat_name", "-W", "-N", "--cache", "--cache-dir", str(tmp_path)]
+    main(options)
+    first = capsys.readouterr()
+    assert mock_messagesdb["obj"].messages_read
+
+    main(options)
+    assert not hasattr(mock_messagesdb["obj"], "messages_read")  # nothing has changed, so no messages are read
+    assert capsys.readouterr() == first  # including the missing Nerdle error
+
+    monkeypatch.setattr(MockMessagesDB, "get_last_rowid", lambda self: 3)  # a message arrived
+    main(options)
+    assert mock_messagesdb["obj"].messages_read
+    main([*options, "--format", "json"])
+    assert mock_messagesdb["obj"].messages_read
+
+
+@pytest.mark.parametrize("option", ("--send-message", "--watch", "--state-file=state.json", "--index=index.db"))
+def test_invalid_cache(option: str, mock_messagesdb: dict[str, MockMessagesDB]):
+    with pytest.raises(SystemExit):
+        main(["user", "chat_name", "--cache", option])
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_index_query(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], tmp_path: Path):
+    path = f"{tmp_path}/index.db"
+    main(["user", "chat1", "chat2", "-W", "--index", path])
+    assert "MEDIAN" not in capsys.readouterr().out  # results are kept without needing --stats
+
+    assert main(["query", path, "--game", "Wordle", "--number", "613", "--chat", "chat2"]) == 0
+    rows = [line.split() for line in capsys.readouterr().out.splitlines()]
+    assert [row[:5] for row in rows] == [["CHAT", "GAME", "NUMBER", "MEMBER", "RESULT"], ["chat2", "Wordle", "613", "name", "4"]]
+
+    main(["query", path, "--member", "12345", "--format", "json"])
+    assert [json.loads(line)["game_number"] for line in capsys.readouterr().out.splitlines()] == [612, 613, 612, 613]
+
+    main(["query", path, "--format", "csv", "--output", f"{tmp_path}/results.csv"])
+    assert Path(f"{tmp_path}/results.csv").read_text(encoding="utf-8").splitlines()[0] == "chat,game,member,handle,game_number,completed,guesses,message_rowid,date"
+
+    assert main(["query", path, "--member", "nobody"]) == 1
+    assert capsys.readouterr().err == "no results found\n"
+
+
+def test_query_missing_index(tmp_path: Path):
+    with pytest.raises(SystemExit):
+        main(["query", f"{tmp_path}/missing.db"])
+
+
+def test_date_member_filters(mock_messagesdb: dict[str, MockMessagesDB]):
+    main(["user", "chat_name", "--since", "2024-01-01", "--until", "2024-01-31", "--member", "John", "--member", "+61123"])
+    message_filter = mock_messagesdb["obj"].message_filter
+    assert message_filter.since == datetime.date(2024, 1, 1)
+    assert message_filter.until == datetime.date(2024, 1, 31)
+    assert message_filter.handles == ("John", "+61123")
+
+
+@pytest.mark.parametrize(
+    "options",
+    (
+        ["--since", "01/01/2024"],
+        ["--state-file", "state.json", "--since", "2024-01-01"],
+        ["--state-file", "state.json", "--member", "John"],
+        ["--state-file", "state.json", "--stats"],
+        ["--state-file", "state.json", "--database", "a.db", "--database", "b.db"],
+    ),
+)
+def test_invalid_filters(options: list[str], mock_messagesdb: dict[str, MockMessagesDB]):
+    with pytest.raises(SystemExit):
+        main(["user", "chat_name", *options])
+
+
+def test_plugin_game_flags(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+    class Wordy(Wordle):
+        pass
+
+    available = {"Wordle": lambda: Wordle, "Wordy": lambda: Wordy}
+    monkeypatch.setattr("chat_summary.chat_summary.get_available_chat_games", lambda: available)
+    main(["user", "chat_name", "-W", "--Wordy"])
+    assert capsys.readouterr().err == "🟥 no 'Wordle' messages found 🟥\n🟥 no 'Wordy' messages found 🟥\n"
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+@pytest.mark.parametrize(("options", "chat_names"), ((["chat1", "chat2"], ["chat1", "chat2"]), (["--all-chats"], MockMessagesDB.ALL_CHATS)))
+def test_batch(options: list[str], chat_names: list[str], mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str]):
+    main(["user", *options, "-W"])
+    out = capsys.readouterr().out
+    for chat_name in chat_names:
+        assert f"💬 {chat_name} 💬\n\n🟨⬛🟩 WORDLE 🟨⬛🟩\n\nCOMPLETIONS (1 days)\n1. name..2\n" in out
+
+
+@pytest.mark.parametrize(
+    "options",
+    ([], ["chat1", "--all-chats"], ["chat1", "chat2", "--state-file", "state.json"], ["--all-chats", "--state-file", "state.json"], ["chat1", "chat2", "--send-message", "--send-concurrency", "0"]),
+)
+def test_invalid_batch(options: list[str], mock_messagesdb: dict[str, MockMessagesDB]):
+    with pytest.raises(SystemExit):
+        main(["user", *options])
+
+
+@pytest.mark.parametrize(("mock_osascript", "mock_messagesdb"), [(False, True)], indirect=True)
+def test_batch_send_message(mock_messagesdb: dict[str, MockMessagesDB], mock_osascript: dict[str, list[str]], monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("Y"))
+    main(["user", "chat1", "chat2", "-W", "--send-message"])
+    sent_to = [arg for arg in mock_osascript["args"] if arg.startswith("tell")]
+    assert len(sent_to) == 2
+    assert 'to chat "chat1"' in sent_to[0] and 'to chat "chat2"' in sent_to[1]
+
+
+@pytest.mark.parametrize(("mock_osascript", "mock_messagesdb"), [(False, False)], indirect=True)
+def test_batch_send_empty_message(mock_messagesdb: dict[str, MockMessagesDB], mock_osascript: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("Y"))
+    assert main(["user", "chat1", "chat2", "-W", "--send-message"]) == 1
+    assert mock_osascript["args"] == []
+    err = capsys.readouterr().err
+    assert "unable to send message to 'chat1' (0/0 parts sent): empty message, no message sent" in err and "unable to send message to 'chat2'" in err
+
+
+@pytest.mark.parametrize(("mock_osascript", "mock_messagesdb"), [(True, True)], indirect=True)
+def test_batch_send_failure(mock_messagesdb: dict[str, MockMessagesDB], mock_osascript: dict[str, list[str]], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("Y"))
+    assert main(["user", "chat1", "chat2", "-W", "--send-message"]) == 1
+    err = capsys.readouterr().err
+    assert "unable to send message to 'chat1'" in err and "unable to send message to 'chat2'" in err  # the batch carries on
+
+
+@pytest.mark.parametrize("mock_messagesdb", [True], indirect=True)
+def test_send_command(mock_messagesdb: dict[str, MockMessagesDB], capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr("sys.stdin", io.StringIO("Y"))
+    script = tmp_path / "send.py"
+    script.write_text("import sys\nopen(sys.argv[1], 'a', encoding='utf-8').write(sys.argv[2] + '\\n')", encoding="utf-8")
+    assert main(["user", "chat1", "chat2", "-W", "--send-message", "--send-command", f"{sys.executable} {script} {tmp_path / 'sent.log'}", "--send-concurrency", "1"]) == 0
+    assert (tmp_path / "sent.log").read_text(encoding="utf-8").splitlines() == ["chat1", "chat2"]
+    assert "message sent successfully to 'chat1'!" in capsys.readouterr().out
@@ -1,7 +1,9 @@
 import pytest
 
-from chat_summary.chat import MESSAGE, ChatMember, ChatSummary
+from chat_summary import chat
+from chat_summary.chat import MEMBER_SUMMARY, MESSAGE, ChatMember, ChatSummary, MemberDirectory, normalise_handle, populate_chats
 from chat_summary.game import RESULT, Game
+from chat_summary.games import Connections, Mini, Nerdle, Wordle
 
 
 @pytest.fixture
@@ -34,11 +36,14 @@ class Game1(Game):
         return "🟨⬛🟩"
 
     def get_score_title(self) -> str:
-        return "Game1"
+        return "GUESSES"
 
     def _get_regex(self) -> str:
         return "Game1"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Game1",)
+
     def analyse_message(self, message: str) -> RESULT | None:
         res = RESULT(self.prev, True, 3)
         self._update_range(self.prev)
@@ -53,11 +58,14 @@ class Game2(Game):
         return "🟨⬛🟩"
 
     def get_score_title(self) -> str:
-        return "Game1"
+        return "GUESSES"
 
     def _get_regex(self) -> str:
         return "Game2"
 
+    def get_prefixes(self) -> tuple[str, ...]:
+        return ("Game2",)
+
     def analyse_message(self, message: str) -> RESULT | None:
         if self.prev == 1:
             self.prev += 1
@@ -76,7 +84,7 @@ class Game3(Game):
         return "🟨⬛🟩"
 
     def get_score_title(self) -> str:
-        return "Game1"
+        return "GUESSES"
 
     def _get_regex(self) -> str:
         return ""
@@ -101,7 +109,7 @@ def get_captured_display(capfd: pytest.CaptureFixture[str], chat_summary: ChatSu
     return chat_summary.get_display()
 
 
-@pytest.mark.parametrize("text", ("GAME1", "GAME2", "John", "Alice", "3/4", "2/2", "2.00", "3.00"))
+@pytest.mark.parametrize("text", ("GAME1", "GAME2", "John", "Alice", "2/3", "66.7%", "2.00", "3.00"))
 def test_chat_summary_display_in(text: str, get_captured_display: str):
     assert text in get_captured_display
 
@@ -109,3 +117,105 @@ def test_chat_summary_display_in(text: str, get_captured_display: str):
 @pytest.mark.parametrize("text", ("Game1", "Game2", "Jake"))
 def test_chat_summary_display_not_in(text: str, get_captured_display: str):
     assert text not in get_captured_display
+
+
+def test_chat_summary_routes_message_to_one_game(chat_summary: ChatSummary):
+    chat_summary.populate([MESSAGE("Game2 message", "1234567890"), MESSAGE("Game2 message", "1234567890")])
+    john = next(member for member in chat_summary._members if member.name == "John")  # pyright: ignore[reportPrivateUsage]
+    assert john.game_scores["Game1"].attempts == 0
+    assert john.game_scores["Game2"].attempts == 1
+
+
+@pytest.mark.parametrize(("handle", "expected"), (("+61 412 345 678", "+61412345678"), ("0412345678", "+61412345678"), ("John@Example.com", "john@example.com"), (None, ""), ("", ""), ("  ", "")))
+def test_normalise_handle(handle: str | None, expected: str):
+    assert normalise_handle(handle) == expected
+
+
+def test_member_directory():
+    directory = MemberDirectory([ChatMember("John", "0412345678"), ChatMember("Alice", "alice@example.com"), ChatMember("me", "user")], "user")
+    assert directory.get("+61412345678") == 0
+    assert directory.get("+61412345678") == 0
+    assert directory.get("Alice@example.com") == 1
+    assert directory.get("user") == 2
+    assert directory.get(None) == 2
+    assert directory.get("") == 2
+    assert directory.get("555") is None
+
+
+def test_populate_chats():
+    summaries = {chat_id: ChatSummary([ChatMember("John", "123")], (Wordle(),)) for chat_id in ("a", "b")}
+    populate_chats(summaries, [MESSAGE("Wordle 1 1/6", "123", 1, "a"), MESSAGE("Wordle 1 2/6", "123", 2, "b"), MESSAGE("Wordle 2 3/6", "123", 3, "a")])
+    assert summaries["a"]._scores["Wordle"][0].completed == 2  # pyright: ignore[reportPrivateUsage]
+    assert summaries["b"]._scores["Wordle"][0].completed == 1  # pyright: ignore[reportPrivateUsage]
+    assert summaries["a"].last_rowid == 3 and summaries["b"].last_rowid == 2
+
+
+def test_display_is_stable():
+    summary = ChatSummary([ChatMember("John", "123"), ChatMember("Jane", "456"), ChatMember("Bob", "789")], (Nerdle(), Wordle()))
+    summary.populate([MESSAGE(f"Wordle {i} 4/6", number) for i in (1, 2) for number in ("123", "456")] + [MESSAGE(f"nerdlegame {i} 3/6", number) for i in (1, 2) for number in ("789", "456")])
+    display = summary.get_display()
+    assert summary.get_display() == display  # members tied for a place don't swap between renders
+    wordle = display[display.index("WORDLE") :]
+    assert wordle.index("John..") < wordle.index("Jane..")
+
+
+def test_results_added():
+    summary = ChatSummary([ChatMember("John", "123")], (Wordle(),))
+    summary.populate([MESSAGE("Wordle 1 4/6", "123"), MESSAGE("hello", "123"), MESSAGE("Wordle 2 1/6", "999")])
+    assert summary.results_added == 1
+
+
+def test_populate_chats_batches_across_runs(monkeypatch: pytest.MonkeyPatch):
+    batches: list[int] = []
+    analyse_batch = ChatSummary._analyse_batch  # pyright: ignore[reportPrivateUsage]
+    monkeypatch.setattr(ChatSummary, "_analyse_batch", lambda self, reads, profiler=None: batches.append(len(reads)) or analyse_batch(self, reads, profiler))
+
+    summaries = {chat_id: ChatSummary([ChatMember("John", "123")], (Wordle(),)) for chat_id in ("a", "b")}
+    populate_chats(summaries, [MESSAGE(f"Wordle {i} 1/6", "123", i, "ab"[i % 2]) for i in range(1, 11)])  # the chats take turns
+    assert batches == [5, 5]
+    assert summaries["a"]._scores["Wordle"][0].completed == 5  # pyright: ignore[reportPrivateUsage]
+
+
+def test_populate_parallel_matches_serial(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(chat, "PARALLEL_CHUNK_SIZE", 2)
+    messages = [
+        MESSAGE("Wordle 1 1/6", "123", 1, "a"),
+        MESSAGE("Wordle 2 X/6", "456", 2, "a"),
+        MESSAGE("Connections \nPuzzle #3\n🟪🟪🟪🟪", "123", 3, "b"),
+        MESSAGE("hello", "456", 4, "a"),
+        MESSAGE("Wordle 7 4/6", "123", 5, "a"),
+        MESSAGE("Wordle 3 2/6", "999", 6, "b"),
+        MESSAGE("Wordle 3 5/6", "456", 7, "a"),
+    ]
+
+    def create_summaries() -> dict[str, ChatSummary]:
+        return {chat_id: ChatSummary([ChatMember("John", "123"), ChatMember("Jane", "456")], (Connections(), Mini(), Wordle()), record_results=True) for chat_id in ("a", "b")}
+
+    serial, parallel = create_summaries(), create_summaries()
+    populate_chats(serial, messages)
+    populate_chats(parallel, messages, workers=2)
+    for chat_id in ("a", "b"):
+        assert parallel[chat_id].get_state() == serial[chat_id].get_state()
+        assert parallel[chat_id].get_display() == serial[chat_id].get_display()
+        assert parallel[chat_id].results_added == serial[chat_id].results_added
+
+
+def test_chat_summary_stats_display():
+    summary = ChatSummary([ChatMember("John", "123"), ChatMember("Jane", "456")], (Wordle(),), record_results=True)
+    summary.populate([MESSAGE("Wordle 1 4/6", "123"), MESSAGE("Wordle 2 2/6", "123"), MESSAGE("Wordle 1 3/6", "456"), MESSAGE("Wordle 2 X/6", "456")])
+    assert summary.get_display().endswith("\nMEDIAN GUESSES (± STD DEV)\n1. Jane..3.0 ± 0.00\n2. John..3.0 ± 1.00\n")
+    assert ChatSummary([ChatMember("John", "123")], (Wordle(),)).results is None
+
+
+def test_get_summaries():
+    summary = ChatSummary([ChatMember("John", "123"), ChatMember("Jane", "456"), ChatMember("Bob", "789")], (Wordle(),))
+    summary.populate([MESSAGE("Wordle 1 4/6", "123"), MESSAGE("Wordle 3 2/6", "123"), MESSAGE("Wordle 1 3/6", "456"), MESSAGE("Wordle 3 3/6", "456")])
+    (game_summary,) = summary.get_summaries()
+    assert game_summary.game == "Wordle" and game_summary.days == 2
+    assert game_summary.members == [
+        MEMBER_SUMMARY("John", "123", 2, 2, 3.0, 1, 1),
+        MEMBER_SUMMARY("Jane", "456", 2, 2, 3.0, 2, 2),
+        MEMBER_SUMMARY("Bob", "789", 0, 0, 0, None, None),
+    ]
+    assert "1. John..2\n2. Jane..2\n" in summary.get_display()  # ranked as the summary posted to the chat numbers them
+    assert "1. John..3.00\n2. Jane..3.00\n" in summary.get_display()
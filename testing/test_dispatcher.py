@@ -0,0 +1,103 @@
+import pytest
+
+from chat_summary.dispatcher import GameDispatcher, get_message_prefixes
+from chat_summary.game import RESULT, Game
+from chat_summary.games import Betweenle, Connections, Mini, Nerdle, Strands, Wordle
+
+
+def create_games() -> tuple[Game, ...]:
+    return (Betweenle(), Connections(), Mini(), Nerdle(), Strands(), Wordle())
+
+
+@pytest.fixture
+def dispatcher():
+    return GameDispatcher(create_games())
+
+
+@pytest.mark.parametrize(
+    ("message", "name"),
+    (
+        ("Wordle 612 4/6", "Wordle"),
+        ("nerdlegame 612 4/6", "Nerdle"),
+        ("Connections \nPuzzle #12\n🟪🟪🟪🟪", "Connections"),
+        ("Strands #12\n🔵🔵💡🔵", "Strands"),
+        ("Betweenle 612 - 4/5", "Betweenle"),
+        ("I solved the 1/2/2024 New York Times Mini Crossword in 0:32!", "Mini"),
+    ),
+)
+def test_dispatch(message: str, name: str, dispatcher: GameDispatcher):
+    dispatched = dispatcher.dispatch(message)
+    assert dispatched is not None
+    assert type(dispatched[0]).__name__ == name
+
+
+@pytest.mark.parametrize("message", ("", "hello", "Wordle is fun", "I solved the puzzle", "W"))
+def test_dispatch_rejects(message: str, dispatcher: GameDispatcher):
+    assert dispatcher.dispatch(message) is None
+
+
+def test_dispatch_only_selected_games():
+    dispatcher = GameDispatcher((Wordle(),))
+    assert dispatcher.dispatch("nerdlegame 612 4/6") is None
+    assert dispatcher.dispatch("Wordle 612 4/6") is not None
+
+
+class Unprefixed(Game):
+    # reads messages its own way, so it is a Game rather than a RegexGame
+    def __init__(self) -> None:
+        self._wordle = Wordle()
+        super().__init__()
+
+    def get_display_emojis(self) -> str:
+        return self._wordle.get_display_emojis()
+
+    def get_score_title(self) -> str:
+        return self._wordle.get_score_title()
+
+    def _get_regex(self) -> str:
+        return self._wordle._get_regex()  # pyright: ignore[reportPrivateUsage]
+
+    def analyse_message(self, message: str) -> RESULT | None:
+        return self._wordle.analyse_message(message.removeprefix("my "))
+
+
+def test_dispatch_fallback():
+    dispatcher = GameDispatcher((Nerdle(), Unprefixed()))
+    dispatched = dispatcher.dispatch("my Wordle 612 4/6")
+    assert dispatched is not None and type(dispatched[0]) is Unprefixed
+
+
+def test_get_message_prefixes():
+    assert get_message_prefixes((Wordle(), Mini())) == ("Wordle ", "https://www.nytimes.com/badges/games/mini.html?d=", "I solved the ")
+    assert get_message_prefixes(()) == ()
+    assert get_message_prefixes((Wordle(), Unprefixed())) is None
+
+
+MESSAGES = [
+    "Wordle 612 4/6\n\n⬛🟨⬛⬛⬛\n🟩🟩🟩🟩🟩",
+    "hello",
+    "Connections \nPuzzle #12\n🟪🟪🟨🟪\n🟪🟪🟪🟪\nshare: connections",
+    "Connections \nPuzzle #13\n🟪🟪🟨🟪",
+    "Connections \nPuzzle #14",
+    "Wordle is fun",
+    "",
+    "nerdlegame 10 X/6\nWordle 611 3/6",
+    "Strands #3\n💡🔵💡🔵",
+    "Betweenle 612 - 4/5",
+    "https://www.nytimes.com/badges/games/mini.html?d=2024-01-02&t=120",
+    "I solved the 1/2/2024 New York Times Mini Crossword in 0:32!",
+    "Wordle 1,042 X/6",
+]
+
+
+def test_dispatch_batch_matches_single_messages():
+    # each message read in a batch of its own, where no other message can affect it
+    serial, batch = GameDispatcher(create_games()), GameDispatcher(games := create_games())
+    expected = [(i, type(dispatched[0]), dispatched[1]) for i, message in enumerate(MESSAGES) if (dispatched := serial.dispatch(message)) is not None]
+    assert sorted((i, type(game), result) for i, game, result in batch.dispatch_batch(MESSAGES)) == expected
+    assert [game.range for game in games] == [game.range for game in serial._prefixed]  # pyright: ignore[reportPrivateUsage]
+
+
+def test_dispatch_batch_fallback():
+    dispatcher = GameDispatcher((Nerdle(), Unprefixed()))
+    assert [(i, type(game)) for i, game, _ in dispatcher.dispatch_batch(["nerdlegame 1 2/6", "my Wordle 612 4/6", "Wordle 1 1/6", "nerdlegame 1"])] == [(0, Nerdle), (1, Unprefixed), (2, Unprefixed)]
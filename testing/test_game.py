@@ -49,6 +49,61 @@ def test_average_guesses_with_no_completed_games(game_score: GameScore):
     assert game_score.average_guesses == 0
 
 
+def test_add_out_of_order_and_repeated_games(game_score: GameScore):
+    for game_number, completed in ((900, True), (1000, False), (3, True), (900, True), (1000, True)):
+        game_score.add(RESULT(game_number, completed, 2))
+    assert game_score.completed == 3
+    assert game_score.attempts == 4
+    assert game_score.get_state() == {"games": [3, 900, 1000], "fails": [1000], "total_guesses": 8}
+
+
+def test_state_round_trip(game_score: GameScore):
+    loaded = GameScore()
+    loaded.load_state({"games": [700, 5], "fails": [6], "total_guesses": 7})
+    assert loaded.get_state() == {"games": [5, 700], "fails": [6], "total_guesses": 7}
+    assert loaded.completed == 2 and loaded.attempts == 3
+
+
+@pytest.mark.parametrize(("first", "second"), (([10, 11], [2, 40]), ([2, 40], [10, 11]), ([], [5]), ([5], [])))
+def test_merge(first: list[int], second: list[int]):
+    merged, other, expected = GameScore(), GameScore(), GameScore()
+    for game_number in first:
+        merged.add(RESULT(game_number, True, 1))
+        expected.add(RESULT(game_number, True, 1))
+    for game_number in second:
+        other.add(RESULT(game_number, game_number % 2 == 0, 1))
+        expected.add(RESULT(game_number, game_number % 2 == 0, 1))
+    merged.merge(other)
+    assert merged.get_state() == expected.get_state()
+
+
+def test_far_outlying_game_number(game_score: GameScore):
+    # e.g. "Wordle 1,000,000,000,000 3/6", which would need a bit for every number in between
+    result = Wordle().analyse_message("Wordle 1,000,000,000,000 3/6")
+    assert result is not None
+    for game_number in (900, 1_000):
+        game_score.add(RESULT(game_number, True, 4))
+    game_score.add(result)
+    game_score.add(RESULT(950, False))
+    assert game_score.completed == 3
+    assert game_score.attempts == 4
+    assert game_score.get_state() == {"games": [900, 1_000, 1_000_000_000_000], "fails": [950], "total_guesses": 11}
+
+
+@pytest.mark.parametrize(("first", "second"), (([10, 11], [10**12]), ([10**12], [10, 11]), ([10, 10**12], [4, 7]), ([4, 7], [10, 10**12])))
+def test_merge_far_outlying(first: list[int], second: list[int]):
+    merged, other, expected = GameScore(), GameScore(), GameScore()
+    for game_number in first:
+        merged.add(RESULT(game_number, True, 1))
+        expected.add(RESULT(game_number, True, 1))
+    for game_number in second:
+        other.add(RESULT(game_number, game_number % 2 == 0, 1))
+        expected.add(RESULT(game_number, game_number % 2 == 0, 1))
+    merged.merge(other)
+    assert merged.get_state() == expected.get_state()
+    assert merged.attempts == len({*first, *second})
+
+
 def test_game():
     game = Wordle()
     assert game.range == 0
@@ -56,3 +111,9 @@ def test_game():
     assert game.range == 0
     assert game.analyse_message("Wordle 316 4/6")
     assert game.range == 2
+
+
+def test_analyse_batch():
+    game = Wordle()
+    assert game.analyse_batch(["hello", "Wordle 1 2/6", "\nWordle 5 2/6", "Wordle 3 X/6\nWordle 4 1/6"]) == [(1, RESULT(1, True, 2)), (3, RESULT(3, False))]
+    assert game.range == 2
@@ -1,9 +1,39 @@
+from importlib.metadata import EntryPoint
+from typing import Callable
+
 import pytest
+
+import chat_summary.get_available_games as get_available_games
 from chat_summary.game import Game
-from chat_summary.get_available_games import get_available_chat_games
+from chat_summary.games import Wordle
+from chat_summary.get_available_games import get_available_chat_games, load_chat_games
+
+
+@pytest.mark.parametrize(("name", "load"), list(get_available_chat_games().items()))
+def test_chat_games(name: str, load: Callable[[], type[Game]]):
+    game = load()
+    assert game.__name__ == name
+    assert issubclass(game, Game) and game != Game
+
+
+def test_chat_games_sorted():
+    names = list(get_available_chat_games())
+    assert names == sorted(names)
+
+
+class Plugin(Wordle):
+    pass
+
+
+def test_plugin_games(monkeypatch: pytest.MonkeyPatch):
+    entry_point = EntryPoint("Plugin", "testing.test_get_games:Plugin", get_available_games.ENTRY_POINT_GROUP)
+    monkeypatch.setattr(get_available_games, "entry_points", lambda group: [entry_point] if group == get_available_games.ENTRY_POINT_GROUP else [])
+
+    available = get_available_chat_games()
+    assert "Plugin" in available and "Wordle" in available
+    assert available["Plugin"]() is Plugin
 
 
-@pytest.mark.parametrize(("name", "game"), list(get_available_chat_games()))
-def test_chat_games(name: str, game: Game):
-    assert type(game).__name__ == name
-    assert isinstance(game, Game) and type(game) != Game
+def test_load_chat_games():
+    games = load_chat_games(get_available_chat_games(), ["Wordle", "Connections", "Wordle"])
+    assert [type(game).__name__ for game in games] == ["Connections", "Wordle"]
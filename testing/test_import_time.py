@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+IMPORT_BUDGET_SECONDS = 0.5  # cold start of every (often tiny, incremental) run
+HEAVY_MODULES = ("pandas", "numpy")
+LAZY_MODULES = ("asyncio", "chat_summary.cache")  # only imported by the options that use them
+
+SCRIPT = f"""\
+import sys, time
+start = time.perf_counter()
+from chat_summary import main
+print(time.perf_counter() - start)
+print(",".join(module for module in {HEAVY_MODULES + LAZY_MODULES!r} if module in sys.modules))
+"""
+
+
+def test_import_time():
+    # best of a few runs in a fresh interpreter to ignore disk cache noise
+    timings: list[float] = []
+    for _ in range(3):
+        out = subprocess.check_output([sys.executable, "-c", SCRIPT], text=True).splitlines()
+        timings.append(float(out[0]))
+        assert out[1] == ""
+
+    assert min(timings) < IMPORT_BUDGET_SECONDS
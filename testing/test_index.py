@@ -0,0 +1,120 @@
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from chat_summary.chat import MESSAGE, ChatMember, ChatSummary
+from chat_summary.games import Nerdle, Wordle
+from chat_summary.index import INDEXED_RESULT, ResultIndex
+
+DAY = 86_400 * 1_000_000_000  # in message dates
+
+
+def make_summary(record_results: bool = True) -> ChatSummary:
+    summary = ChatSummary([ChatMember("Alice", "0412 345 678"), ChatMember("Bob", "bob@example.com"), ChatMember("me", "")], (Nerdle(), Wordle()), "user", record_results)
+    summary.populate(
+        [
+            MESSAGE("Wordle 1,042 3/6", "+61412345678", 1, date=DAY),
+            MESSAGE("Wordle 1,042 X/6", "bob@example.com", 2, date=DAY),
+            MESSAGE("Wordle 1,042 2/6", "+61412345678", 3, date=DAY),  # a second go doesn't replace the first
+            MESSAGE("nerdlegame 10 4/6", "bob@example.com", 4, date=2 * DAY),
+            MESSAGE("Wordle 1,043 5/6", "user", 5, date=2 * DAY),
+        ]
+    )
+    return summary
+
+
+@pytest.fixture
+def index(tmp_path: Path):
+    index = ResultIndex(f"{tmp_path}/index.db")
+    yield index
+    index.close()
+
+
+def test_index_add(index: ResultIndex):
+    assert index.add("chat", make_summary()) == 4
+    assert index.add("chat", make_summary()) == 0  # already indexed
+    assert index.add("other", make_summary(record_results=False)) == 0
+
+    assert index.query() == [
+        INDEXED_RESULT("chat", "Nerdle", "Bob", "bob@example.com", 10, True, 4, 4, 978_307_200 + 2 * 86_400),
+        INDEXED_RESULT("chat", "Wordle", "Alice", "+61412345678", 1042, True, 3, 1, 978_307_200 + 86_400),
+        INDEXED_RESULT("chat", "Wordle", "Bob", "bob@example.com", 1042, False, -1, 2, 978_307_200 + 86_400),
+        INDEXED_RESULT("chat", "Wordle", "me", "", 1043, True, 5, 5, 978_307_200 + 2 * 86_400),
+    ]
+
+
+def test_index_add_after(index: ResultIndex):
+    # only the results read since the counts were taken are added
+    summary = make_summary()
+    assert summary.results is not None
+    counts = summary.results.get_counts()
+    assert counts == {"Nerdle": 1, "Wordle": 4}
+    summary.populate([MESSAGE("Wordle 1,044 4/6", "bob@example.com", 6, date=3 * DAY)])
+    assert index.add("chat", summary, counts) == 1
+    assert [result.message_rowid for result in index.query()] == [6]
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    (
+        ({"game": "Wordle", "member": "Alice", "game_number": 1042}, [1]),
+        ({"member": "0412345678"}, [1]),
+        ({"member": "BOB@example.com"}, [4, 2]),
+        ({"game": "Wordle", "game_number": 1042}, [1, 2]),
+        ({"chat": "other"}, []),
+    ),
+)
+def test_index_query(query: dict[str, Any], expected: list[int], index: ResultIndex):
+    index.add("chat", make_summary())
+    assert [result.message_rowid for result in index.query(**query)] == expected
+
+
+def test_index_query_plan(index: ResultIndex):
+    plan = index._connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM result WHERE game = ? AND member = ? AND game_number = ?", ("Wordle", "Alice", 1)
+    ).fetchall()  # pyright: ignore[reportPrivateUsage]
+    assert "result_idx_game_member_number" in str(plan)
+
+
+def test_index_rebuilt_on_version(tmp_path: Path):
+    path = f"{tmp_path}/index.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript("CREATE TABLE result (old TEXT); PRAGMA user_version = 99;")
+    connection.close()
+
+    index = ResultIndex(path)
+    assert index.add("chat", make_summary()) == 4
+    index.close()
+
+
+def test_index_not_a_database(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    (tmp_path / "index.db").write_text("not a database" * 100)
+    with pytest.raises(SystemExit):
+        ResultIndex(f"{tmp_path}/index.db")
+    assert capsys.readouterr().err == "unable to open result index, ensure it is a file written by --index\n"
+
+
+@pytest.mark.parametrize("script", ("CREATE TABLE message (text TEXT); PRAGMA user_version = 17000;", "CREATE TABLE result (old TEXT); PRAGMA user_version = 99;", "PRAGMA user_version = 1;"))
+def test_index_read_only_unchanged(script: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    # e.g. a chat.db given to query by mistake, or an index written by another version
+    path = f"{tmp_path}/other.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(script)
+    connection.close()
+    before = Path(path).read_bytes()
+
+    with pytest.raises(SystemExit):
+        ResultIndex(path, read_only=True)
+    assert capsys.readouterr().err == "unable to open result index, ensure it is a file written by --index\n"
+    assert Path(path).read_bytes() == before
+
+
+def test_index_read_only(index: ResultIndex, tmp_path: Path):
+    index.add("chat", make_summary())
+    reader = ResultIndex(f"{tmp_path}/index.db", read_only=True)
+    assert [result.message_rowid for result in reader.query(member="Alice")] == [1]
+    with pytest.raises(sqlite3.OperationalError):
+        reader.add("other", make_summary())
+    reader.close()
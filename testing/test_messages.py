@@ -3,11 +3,11 @@ import sqlite3
 import sys
 from typing import Any
 
-import pandas
 import pytest
 
-from chat_summary.chat import MESSAGE
+from chat_summary.chat import MESSAGE, ChatMember
 from chat_summary.messages import MessagesDB
+from testing.synthetic_db import create_addressbook_db, create_chat_db, get_room_names
 
 
 @pytest.fixture
@@ -22,29 +22,51 @@ def capture_std_err(monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
     return buffer
 
 
+class MockConnection:
+    def __init__(self, results: list[list[tuple[Any, ...]]] | None = None) -> None:
+        self.results = (results or [])[::-1]
+        self.rows: list[tuple[Any, ...]] = []
+        self.queries: list[str] = []
+
+    def execute(self, query: str, *_: Any):
+        self.queries.append(query)
+        if not query.startswith("PRAGMA"):
+            self.rows = self.results.pop()
+        return self
+
+    def cursor(self):
+        return self
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, _: int):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
 @pytest.fixture
 def mock_sql_connect(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest):
     def f0():
         raise sqlite3.OperationalError
 
     def f1():
-        return "connections obj"
-
-    def f2():
-        class f:
-            def close(self) -> None:
-                pass
-
-        return f()
+        return MockConnection()
 
     def f3():
         raise FileNotFoundError
 
-    funcs = {0: f0, 1: f1, 2: f2, 3: f3}
+    funcs = {0: f0, 1: f1, 3: f3}
 
-    info = [funcs[n] for n in reversed(request.param)]
+    info = [funcs[n] if isinstance(n, int) else (lambda n=n: n) for n in reversed(request.param)]
 
-    def mock_connect(s: str):
+    def mock_connect(s: str, **_: Any):
         return info.pop()()
 
     monkeypatch.setattr(sqlite3, "connect", mock_connect)
@@ -60,45 +82,10 @@ def mock_listdir(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest
     monkeypatch.setattr(os, "listdir", list_dir)
 
 
-@pytest.fixture
-def mock_read_sql_query(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest):
-    data = request.param[::-1]
-
-    def read_sql(*_: Any):
-        datum = data.pop()
-        if isinstance(datum, BaseException):
-            raise datum
-        return datum
-
-    monkeypatch.setattr(pandas, "read_sql_query", read_sql)
-
-
-class MockObj:
-    class _iloc:
-        def __init__(self, len: int) -> None:
-            self.len = len
-
-        def __getitem__(self, v: tuple[int, slice]):
-            if self.len == 3:
-                return f"{v[0]}", f"{v[0]}", "0123"
-            return f"{v[0]}", "0123"
-
-    def __init__(self, *, getitem: dict[str, Any] | None = None, len: int = 3) -> None:
-        self.getitem = getitem
-        self.len = len
-        self.iloc = self._iloc(len)
-
-    def __getitem__(self, value: str):  # type: ignore
-        return self.getitem[value]  # type: ignore
-
-    def __len__(self) -> int:
-        return self.len
-
-
 @pytest.mark.parametrize("mock_listdir", ([[""]]), indirect=True)
 def test_no_user_found(mock_listdir: None, capture_std_err: dict[str, str]):
     with pytest.raises(SystemExit) as sys_exit:
-        MessagesDB("user", "", False)
+        MessagesDB("user", [""], False)
     assert sys_exit.value.code == 1
     assert capture_std_err["err"].startswith("user not found, user should be one of: ")
 
@@ -106,7 +93,7 @@ def test_no_user_found(mock_listdir: None, capture_std_err: dict[str, str]):
 @pytest.mark.parametrize(("mock_listdir", "mock_sql_connect"), [([["user"]], [0])], indirect=True)
 def test_operational_error(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
     with pytest.raises(SystemExit) as sys_exit:
-        MessagesDB("user", "", False)
+        MessagesDB("user", [""], False)
     assert sys_exit.value.code == 1
     assert capture_std_err["err"] == "could not connect to messages database, ensure you have the right permissions to access file\n"
 
@@ -114,22 +101,22 @@ def test_operational_error(mock_listdir: None, mock_sql_connect: None, capture_s
 @pytest.mark.parametrize(("mock_listdir", "mock_sql_connect"), [([["user"]], [3])], indirect=True)
 def test_filenotfound_error(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
     with pytest.raises(SystemExit) as sys_exit:
-        MessagesDB("user", "", False)
+        MessagesDB("user", [""], False)
     assert sys_exit.value.code == 1
     assert capture_std_err["err"] == "could not find stored messages, ensure you have signed in and uploaded iMessages to iCloud\n"
 
 
 @pytest.mark.parametrize(
-    ("mock_listdir", "mock_read_sql_query", "mock_sql_connect"),
+    ("mock_listdir", "mock_sql_connect"),
     [
-        ([["user"]], [MockObj(getitem={"ROWID": [], "display_name": []})], [1]),
+        ([["user"]], [MockConnection([[(1, "other chat", "room")]])]),
     ],
     indirect=True,
 )
-def test_failed_chat_name(mock_listdir: None, mock_read_sql_query: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
-    messagedb = MessagesDB("user", "chat-name", False)
+def test_failed_chat_name(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    messagedb = MessagesDB("user", ["chat-name"], False)
     with pytest.raises(SystemExit) as sys_exit:
-        messagedb.get_messages_members_from_chat()
+        messagedb.get_messages_members_from_chats()
     assert sys_exit.value.code == 1
     assert capture_std_err["err"].startswith("chat name not found, should be one of: ")
 
@@ -142,7 +129,7 @@ def test_failed_chat_name(mock_listdir: None, mock_read_sql_query: None, mock_sq
     indirect=True,
 )
 def test_addressbook_path_not_found(mock_listdir: None, mock_sql_connect: None):
-    m = MessagesDB("user", "", False)
+    m = MessagesDB("user", [""], False)
     with pytest.raises(FileNotFoundError):
         m._get_addressbook_db_path()  # pyright: ignore[reportPrivateUsage]
 
@@ -155,63 +142,171 @@ def test_addressbook_path_not_found(mock_listdir: None, mock_sql_connect: None):
     indirect=True,
 )
 def test_addressbook_path(mock_listdir: None, mock_sql_connect: None):
-    m = MessagesDB("user", "", False)
+    m = MessagesDB("user", [""], False)
     assert m._get_addressbook_db_path() == "/Users/user/Library/Application Support/AddressBook/Sources/x/AddressBook-v22.abcddb"  # pyright: ignore[reportPrivateUsage]
 
 
 @pytest.mark.parametrize(
-    ("mock_listdir", "mock_read_sql_query", "mock_sql_connect"),
+    ("mock_listdir", "mock_sql_connect"),
     [
-        ([["user"], []], [MockObj(getitem={"ROWID": [0], "display_name": ["1"]}), MockObj(getitem={"id": []}), SystemExit()], [1]),
+        ([["user"], []], [MockConnection([[(0, "1", "room")], [("345",)]])]),
     ],
     indirect=True,
 )
-def test_addressbook_fail(mock_listdir: None, mock_read_sql_query: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
-    m = MessagesDB("user", "1", False)
-    with pytest.raises(SystemExit):
-        m.get_messages_members_from_chat()
+def test_addressbook_fail(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", ["1"], False)
+    _, chats = m.get_messages_members_from_chats()
+    members = chats["room"].members
+    assert [(member.name, member.number) for member in members] == [("345", "345"), ("user", "")]
     assert capture_std_err["err"] == "unable to find contacts\n"
 
 
 @pytest.mark.parametrize(
-    ("mock_listdir", "mock_read_sql_query", "mock_sql_connect"),
+    ("mock_listdir", "mock_sql_connect"),
     [
-        ([["user"], []], [MockObj(getitem={"ROWID": [0], "display_name": ["1"]}), MockObj(getitem={"id": []}), SystemExit()], [1]),
+        ([["user"], []], [MockConnection([[(0, "1", "room")], [("345",)]])]),
     ],
     indirect=True,
 )
-def test_addressbook_fail_silenced(mock_listdir: None, mock_read_sql_query: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
-    m = MessagesDB("user", "1", True)
-    with pytest.raises(SystemExit):
-        m.get_messages_members_from_chat()
+def test_addressbook_fail_silenced(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", ["1"], True)
+    _, chats = m.get_messages_members_from_chats()
+    members = chats["room"].members
+    assert [(member.name, member.number) for member in members] == [("345", "345"), ("user", "")]
     assert capture_std_err["err"] == ""
 
 
 @pytest.mark.parametrize(
-    ("mock_listdir", "mock_read_sql_query", "mock_sql_connect"),
+    ("mock_listdir", "mock_sql_connect"),
     [
-        ([["user"], ["x"], ["AddressBook-v22.abcddb"]], [MockObj(getitem={"id": ["+61123", "345"]}), MockObj(getitem={"id": ["0123", "345"]})], [1, 2]),
+        (
+            [["user"], ["x"], ["AddressBook-v22.abcddb"]],
+            [
+                MockConnection([[("+61123",), ("345",), ("a@b.com",)]]),
+                MockConnection([[("Jane", "Doe", "0123", None), ("1", None, "0 123", "A@b.com"), ("2", "2", "999", "a@b.com"), (None, "Smith", "888", None)]]),
+            ],
+        ),
     ],
     indirect=True,
 )
-def test_chat_members(mock_listdir: None, mock_read_sql_query: None, mock_sql_connect: None):
-    m = MessagesDB("user", "1", False)
-    members = m._get_chat_members(1)  # pyright: ignore[reportPrivateUsage]
-    assert members[0].name == "0" and members[0].number == "+61123"
+def test_chat_members(mock_listdir: None, mock_sql_connect: None):
+    m = MessagesDB("user", ["1"], False)
+    members = m._get_chat_members(m._connections[0], 1)  # pyright: ignore[reportPrivateUsage]
+    assert members[0].name == "Jane Doe" and members[0].number == "+61123"
     assert members[1].name == "345" and members[1].number == "345"
-    assert members[2].name == "user" and members[2].number == ""
+    assert members[2].name == "1" and members[2].number == "a@b.com"
+    assert members[3].name == "user" and members[3].number == "user"
 
 
 @pytest.mark.parametrize(
-    ("mock_listdir", "mock_read_sql_query", "mock_sql_connect"),
+    ("mock_listdir", "mock_sql_connect"),
     [
-        ([["user"], []], [MockObj(getitem={"ROWID": [0], "display_name": ["1"]}), MockObj(getitem={"id": []}), MockObj(len=2)], [1]),
+        (
+            [["user"], []],
+            [
+                MockConnection(
+                    [[(0, "1", "room")], [], [(1, "Wordle 1 1/6", None, "0123", "room", "g1", 1000), (2, "hello", None, None, "room", "g2", 2000), (3, None, None, None, "room", "g3", 3000)]]
+                )
+            ],
+        ),
     ],
     indirect=True,
 )
-def test_full_runthrough(mock_listdir: None, mock_read_sql_query: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
-    m = MessagesDB("user", "1", False)
+def test_full_runthrough(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", ["1"], False)
+
+    messages, chats = m.get_messages_members_from_chats()
+    assert list(messages) == [MESSAGE("Wordle 1 1/6", "0123", 1, "room", "g1", 1000), MESSAGE("hello", "user", 2, "room", "g2", 2000)]
+    assert list(chats) == ["room"] and chats["room"].name == "1"
+    members = chats["room"].members
+    assert len(members) == 1 and members[0].name == "user" and members[0].number == ""
+
+
+@pytest.mark.parametrize(("mock_listdir", "mock_sql_connect"), [([["user"]], [1])], indirect=True)
+def test_member_handles(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", ["1"], False)
+    members = [ChatMember("John", "+61412345678"), ChatMember("user", "")]
+    assert m._get_member_handles(members, ("John", "0412 345 678", "user")) == ("+61412345678", "+61412345678", "user")  # pyright: ignore[reportPrivateUsage]
+    with pytest.raises(SystemExit):
+        m._get_member_handles(members, ("Alice",))  # pyright: ignore[reportPrivateUsage]
+    assert capture_std_err["err"] == "member not found, should be one of: 'John', 'user'\n"
+
+
+@pytest.mark.parametrize(
+    ("chat_names", "mock_listdir", "mock_sql_connect"),
+    [
+        (chat_names, [["user"], []], [MockConnection([[(0, "1", "room1"), (1, "2", "room2"), (2, "3", "room3"), (3, "1", "room4")], [("+61123",)], [("345",)], [("",)]])])
+        for chat_names in (["1", "2"], None)
+    ],
+    indirect=["mock_listdir", "mock_sql_connect"],
+)
+def test_multiple_chats(chat_names: list[str] | None, mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", chat_names, False)
+    _, chats = m.get_messages_members_from_chats()
+    assert [chat.name for chat in chats.values()] == (chat_names or ["1", "2", "3"])
+    assert [member.number for member in chats["room1"].members] == ["+61123", ""]
+    assert [member.number for member in chats["room2"].members] == ["345", ""]
+    assert capture_std_err["err"] == "unable to find contacts\n"  # contacts are only loaded once
+
 
-    res = m.get_messages_members_from_chat()
-    assert list(res[0]) == [MESSAGE("0", "0123"), MESSAGE("1", "0123")]
-    assert len(res[1]) == 1 and res[1][0].name == "user" and res[1][0].number == ""
+@pytest.mark.parametrize(
+    ("mock_listdir", "mock_sql_connect"),
+    [
+        (
+            [["user"], []],
+            [
+                MockConnection([[(0, "1", "room")], [("+61123",)], [(1, "Wordle 1 1/6", None, "+61123", "room", "g1", 1000), (2, "Wordle 2 2/6", None, "+61123", "room", "g2", 2000)]]),
+                MockConnection(
+                    [[(5, "1", "room"), (6, "2", "room2")], [("+61123",), ("345",)], [(9, "Wordle 2 2/6", None, "+61123", "room", "g2", 9000), (10, "Wordle 3 3/6", None, "345", "room", "g3", 10000)]]
+                ),
+            ],
+        ),
+    ],
+    indirect=True,
+)
+def test_multiple_databases(mock_listdir: None, mock_sql_connect: None, capture_std_err: dict[str, str]):
+    m = MessagesDB("user", ["1"], True, chat_paths=["old.db", "new.db"])
+    messages, chats = m.get_messages_members_from_chats()
+    assert sorted(message.guid for message in messages) == ["g1", "g2", "g3"]  # the message in both databases is only read once
+    assert [member.number for member in chats["room"].members] == ["+61123", "", "345"]
+
+
+def test_new_messages(tmp_path: Any):
+    path = f"{tmp_path}/chat.db"
+    create_chat_db(path, messages=20, game_ratio=1)
+    m = MessagesDB("user", ["Chat 1"], True, chat_paths=[path], addressbook_path=f"{tmp_path}/missing.abcddb")
+    messages, _ = m.get_messages_members_from_chats()
+    assert len(list(messages)) == 20
+    assert m.get_last_rowid() == 20
+
+    with sqlite3.connect(path) as connection:  # a message arrives while the database is open
+        connection.execute("INSERT INTO message VALUES (21, 'new', 'Wordle 900 3/6', 1, 'iMessage', 0, 0, ?, NULL)", (get_room_names(1)[0],))
+        connection.execute("INSERT INTO chat_message_join VALUES (1, 21, 0)")
+    connection.close()
+    assert m.get_last_rowid() == 21
+    assert [(message.rowid, message.content) for message in m.get_new_messages(20)] == [(21, "Wordle 900 3/6")]
+    assert list(m.get_new_messages(21)) == []
+
+
+def test_contacts_version(tmp_path: Any):
+    path = f"{tmp_path}/chat.db"
+    create_chat_db(path, messages=0)
+    assert MessagesDB("user", None, True, chat_paths=[path], addressbook_path=f"{tmp_path}/missing.abcddb").get_contacts_version() is None
+
+    addressbook_path = f"{tmp_path}/contacts.abcddb"
+    create_addressbook_db(addressbook_path)
+    m = MessagesDB("user", None, True, chat_paths=[path], addressbook_path=addressbook_path)
+    database = os.stat(addressbook_path)
+    assert m.get_contacts_version() == (database.st_mtime, database.st_size, 0, 0)
+
+    # an edit in WAL mode is written to the log, leaving the database itself as it was until a checkpoint
+    connection = sqlite3.connect(addressbook_path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA wal_autocheckpoint = 0")
+    before = m.get_contacts_version()
+    connection.execute("UPDATE ZABCDRECORD SET ZFIRSTNAME = 'Renamed' WHERE Z_PK = 1")
+    connection.commit()
+    after = m.get_contacts_version()
+    connection.close()
+    assert before is not None and after is not None
+    assert after[:2] == before[:2] and after != before
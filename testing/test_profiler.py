@@ -0,0 +1,58 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Generator
+
+import pytest
+
+from chat_summary.chat import MESSAGE, ChatMember, ChatSummary
+from chat_summary.games import Nerdle, Wordle
+from chat_summary.profiler import Profiler, get_profiler, profile_stage, start_profiler, stop_profiler
+from chat_summary.read_messages import read_messages
+from testing.test_read_messages import chat_db, chat_db_path  # noqa: F401, fixtures
+
+
+@pytest.fixture
+def profiler() -> Generator[Profiler, None, None]:
+    profiler = start_profiler(trace_memory=True)
+    yield profiler
+    stop_profiler()
+
+
+def test_not_profiling():
+    assert get_profiler() is None
+    with profile_stage("stage"):
+        pass
+
+
+def test_stages(profiler: Profiler, tmp_path: Path):
+    with profile_stage("open"):
+        pass
+    profiler.add_time("decode", 1_000_000, 1)
+    profiler.add_time("decode", 2_000_000, 1)
+    stop_profiler()
+
+    report = profiler.get_report()
+    assert "PEAK MEMORY" in report
+    assert ["decode", "3.00", "2", "2"] in [line.split() for line in report.splitlines()]
+
+    profiler.write_trace(f"{tmp_path}/trace.json")
+    with open(f"{tmp_path}/trace.json", encoding="utf-8") as file:
+        assert [event["name"] for event in json.load(file)["traceEvents"]] == ["open"]  # only whole stages are traced
+
+
+def test_read_messages_profiled(profiler: Profiler, chat_db: sqlite3.Connection):
+    assert len(list(read_messages(chat_db, ("chat1",), "user"))) == 4
+    report = profiler.get_report()
+    assert "fetch rows" in report and "decode attributedBody" in report
+
+
+def test_populate_profiled(profiler: Profiler):
+    summary = ChatSummary([ChatMember("John", "123")], (Nerdle(), Wordle()))
+    summary.populate([MESSAGE("Wordle 1 2/6", "123"), MESSAGE("Wordle is fun", "123"), MESSAGE("nerdlegame 1 3/6", "123"), MESSAGE("hello", "123"), MESSAGE("Wordle 2 2/6", "456")])
+    assert summary.get_state()["scores"]["Wordle"]["123"]["games"] == [1]
+
+    rows = [line.split() for line in profiler.get_report().splitlines()]
+    assert ["Nerdle", "1", "0"] in rows and ["Wordle", "1", "1"] in rows and ["(no", "game)", "0", "1"] in rows
+    parse_games = next(row for row in rows if row[:2] == ["parse", "games"])
+    assert parse_games[3:] == ["1", "4"]  # one batch of 4 messages, parsed as unprofiled runs are
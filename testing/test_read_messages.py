@@ -0,0 +1,158 @@
+import datetime
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Generator
+
+import pytest
+
+from chat_summary.chat import MESSAGE
+from chat_summary.read_messages import MessageFilter, connect_read_only, merge_messages, read_messages
+from testing.synthetic_db import make_attributed_body
+
+
+def apple_time(year: int, month: int, day: int) -> int:
+    noon = datetime.datetime(year, month, day, 12).astimezone()
+    return int((noon - datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)).total_seconds()) * 1_000_000_000
+
+
+@pytest.fixture
+def chat_db_path(tmp_path: Path) -> str:
+    path = f"{tmp_path}/chat.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT);
+            CREATE TABLE chat (ROWID INTEGER PRIMARY KEY, room_name TEXT, display_name TEXT);
+            CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT, attributedBody BLOB, handle_id INTEGER, cache_roomnames TEXT, date INTEGER, guid TEXT);
+            INSERT INTO handle VALUES (1, '+61123'), (2, 'a@b.com');
+            INSERT INTO chat VALUES (1, 'chat1', 'Chat One'), (2, 'chat2', 'Chat Two');
+            """
+        )
+        conn.executemany(
+            "INSERT INTO message VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "Wordle 612 4/6", None, 1, "chat1", apple_time(2024, 1, 1), "g1"),
+                (2, None, make_attributed_body("Wordle 612 3/6"), 2, "chat1", apple_time(2024, 1, 2), "g2"),
+                (3, "hello", None, 0, "chat1", apple_time(2024, 1, 2), "g3"),
+                (4, "Wordle 612 2/6", None, 1, "chat2", apple_time(2024, 1, 3), "g4"),
+                (5, None, None, 1, "chat1", apple_time(2024, 1, 3), "g5"),
+                (6, None, b"garbage", 1, "chat1", apple_time(2024, 1, 3), "g6"),
+                (7, "nerdlegame 10 X/6", None, 2, "chat1", apple_time(2024, 1, 4), "g7"),
+            ],
+        )
+    return path
+
+
+@pytest.fixture
+def chat_db(chat_db_path: str) -> Generator[sqlite3.Connection, None, None]:
+    connection = connect_read_only(chat_db_path)
+    yield connection
+    connection.close()
+
+
+def test_read_messages(chat_db: sqlite3.Connection):
+    assert list(read_messages(chat_db, ("chat1",), "user")) == [
+        MESSAGE("Wordle 612 4/6", "+61123", 1, "chat1", "g1", apple_time(2024, 1, 1)),
+        MESSAGE("Wordle 612 3/6", "a@b.com", 2, "chat1", "g2", apple_time(2024, 1, 2)),
+        MESSAGE("hello", "user", 3, "chat1", "g3", apple_time(2024, 1, 2)),
+        MESSAGE("nerdlegame 10 X/6", "a@b.com", 7, "chat1", "g7", apple_time(2024, 1, 4)),
+    ]
+
+
+@pytest.mark.parametrize("batch_size", (1, 2, 3, 1_000))
+def test_read_messages_batches(batch_size: int, chat_db: sqlite3.Connection):
+    messages = read_messages(chat_db, ("chat1",), "user", batch_size=batch_size)
+    assert isinstance(messages, Generator)
+    assert [message.rowid for message in messages] == [1, 2, 3, 7]
+
+
+@pytest.mark.parametrize(("after_rowid", "expected"), ((0, [1, 2, 3, 7]), (2, [3, 7]), (7, [])))
+def test_read_messages_after_rowid(after_rowid: int, expected: list[int], chat_db: sqlite3.Connection):
+    assert [message.rowid for message in read_messages(chat_db, ("chat1",), "user", MessageFilter(after_rowid))] == expected
+
+
+def test_read_messages_chats(chat_db: sqlite3.Connection):
+    assert [(message.rowid, message.chat_id) for message in read_messages(chat_db, ("chat1", "chat2"), "user")] == [(1, "chat1"), (2, "chat1"), (3, "chat1"), (4, "chat2"), (7, "chat1")]
+    assert [message.rowid for message in read_messages(chat_db, ("chat2",), "user")] == [4]
+
+
+@pytest.mark.parametrize(
+    ("prefixes", "expected"),
+    (
+        (None, [1, 2, 3, 7]),
+        (("Wordle ",), [1, 2]),
+        (("nerdlegame ",), [7]),
+        (("Wordle ", "nerdlegame "), [1, 2, 7]),
+        (("Wor_le ",), []),
+        (("Wordle 612 3",), [2]),
+        ((), []),
+    ),
+)
+def test_read_messages_prefixes(prefixes: tuple[str, ...] | None, expected: list[int], chat_db: sqlite3.Connection):
+    assert [message.rowid for message in read_messages(chat_db, ("chat1",), "user", MessageFilter(prefixes=prefixes))] == expected
+
+
+@pytest.mark.parametrize(
+    ("since", "until", "expected"),
+    (
+        (datetime.date(2024, 1, 2), None, [2, 3, 7]),
+        (None, datetime.date(2024, 1, 2), [1, 2, 3]),
+        (datetime.date(2024, 1, 2), datetime.date(2024, 1, 3), [2, 3]),
+        (datetime.date(2024, 1, 5), None, []),
+    ),
+)
+def test_read_messages_dates(since: datetime.date | None, until: datetime.date | None, expected: list[int], chat_db: sqlite3.Connection):
+    assert [message.rowid for message in read_messages(chat_db, ("chat1",), "user", MessageFilter(since=since, until=until))] == expected
+
+
+@pytest.mark.parametrize(("handles", "expected"), ((("+61123",), [1]), (("a@b.com", "user"), [2, 3, 7]), (("user",), [3]), ((), [])))
+def test_read_messages_handles(handles: tuple[str, ...], expected: list[int], chat_db: sqlite3.Connection):
+    assert [message.rowid for message in read_messages(chat_db, ("chat1",), "user", MessageFilter(handles=handles))] == expected
+
+
+def test_connect_read_only(chat_db: sqlite3.Connection):
+    assert chat_db.execute("PRAGMA query_only").fetchone() == (1,)
+    assert chat_db.execute("PRAGMA temp_store").fetchone() == (2,)
+    with pytest.raises(sqlite3.OperationalError):
+        chat_db.execute("DELETE FROM message")
+
+
+@pytest.mark.parametrize("name", ("we#ird", pytest.param("what?", marks=pytest.mark.skipif(sys.platform == "win32", reason="not a valid windows path")), "100%", "a b"))
+def test_connect_read_only_special_path(name: str, chat_db_path: str, tmp_path: Path):
+    directory = tmp_path / name
+    directory.mkdir()
+    path = directory / "chat.db"
+    Path(chat_db_path).rename(path)
+
+    connection = connect_read_only(str(path))
+    assert len(list(read_messages(connection, ("chat1",), "user"))) == 4
+    connection.close()
+    assert sorted(file.name for file in tmp_path.iterdir()) == [name]  # nothing was created at a truncated path
+
+
+def test_connect_read_only_missing(tmp_path: Path):
+    with pytest.raises(sqlite3.OperationalError):
+        connect_read_only(f"{tmp_path}/missing.db")
+
+
+def test_merge_messages(chat_db_path: str):
+    connections = [connect_read_only(chat_db_path), connect_read_only(chat_db_path)]
+    messages = merge_messages([read_messages(connection, ("chat1", "chat2"), "user") for connection in connections], queue_size=1)
+    assert sorted(message.rowid for message in messages) == [1, 2, 3, 4, 7]
+
+
+def test_merge_messages_stops_early(chat_db_path: str):
+    connections = [connect_read_only(chat_db_path), connect_read_only(chat_db_path)]
+    messages = merge_messages([read_messages(connection, ("chat1",), "user") for connection in connections], queue_size=1)
+    assert next(messages).rowid == 1
+    messages.close()  # readers blocked on the full queue are released
+
+
+def test_merge_messages_error():
+    def failing():
+        yield MESSAGE("Wordle 612 4/6", "user", 1, "chat1", "g1")
+        raise sqlite3.OperationalError
+
+    with pytest.raises(sqlite3.OperationalError):
+        list(merge_messages([failing(), iter([])]))
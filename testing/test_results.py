@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+from chat_summary.game import RESULT
+from chat_summary.results import ResultStore
+
+
+@pytest.fixture
+def result_store() -> ResultStore:
+    store = ResultStore(["Wordle", "Nerdle"])
+    for member_id, game_number, completed, guesses in ((0, 1, True, 3), (1, 1, True, 5), (0, 2, True, 4), (0, 3, False, -1), (1, 2, True, 5), (0, 4, True, 5)):
+        store.add("Wordle", member_id, RESULT(game_number, completed, guesses))
+    return store
+
+
+def test_get_columns(result_store: ResultStore):
+    columns = result_store.get_columns("Wordle")
+    assert columns["member_id"].tolist() == [0, 1, 0, 0, 1, 0]
+    assert columns["completed"].tolist() == [True, True, True, False, True, True]
+    assert result_store.get_columns("Nerdle")["guesses"].tolist() == []
+
+
+def test_get_guess_stats(result_store: ResultStore):
+    stats = result_store.get_guess_stats("Wordle", (0, 100))
+    assert stats[0].games == 3 and stats[0].median == 4 and stats[0].percentiles == (3, 5)
+    assert stats[0].std == pytest.approx((2 / 3) ** 0.5)
+    assert stats[1].games == 2 and stats[1].median == 5 and stats[1].std == 0
+    assert result_store.get_guess_stats("Nerdle") == {}
+
+
+def test_get_guess_distribution(result_store: ResultStore):
+    assert result_store.get_guess_distribution("Wordle") == {0: {3: 1, 4: 1, 5: 1}, 1: {5: 2}}
+
+
+def test_merge(result_store: ResultStore):
+    other = ResultStore(["Wordle", "Nerdle"])
+    other.add("Wordle", 1, RESULT(3, True, 2))
+    result_store.merge(other)
+    assert result_store.get_guess_distribution("Wordle")[1] == {2: 1, 5: 2}
+
+
+def test_numpy_missing(result_store: ResultStore, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(SystemExit):
+        result_store.get_guess_stats("Wordle")
@@ -1,20 +1,20 @@
-import subprocess
+import sys
+from pathlib import Path
 
 import pytest
 
-from chat_summary.send_message import send_message
+from chat_summary.send_message import SEND_RESULT, escape_applescript, osascript_command, program_command, send_message, send_messages, split_message
 
 
 @pytest.fixture
-def mock_check_call(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest) -> dict[str, list[str]]:
+def mock_osascript(monkeypatch: pytest.MonkeyPatch, request: pytest.FixtureRequest) -> dict[str, list[str]]:
     buffer: dict[str, list[str]] = {"args": []}
 
-    def check_call(args: list[str]) -> None:
-        if request.param:
-            raise subprocess.CalledProcessError(1, "")
-        buffer["args"] += args
+    def command(chat_name: str, message: str) -> list[str]:
+        buffer["args"] += osascript_command(chat_name, message)
+        return [sys.executable, "-c", "exit(1)" if request.param else "pass"]  # runs anywhere, unlike osascript
 
-    monkeypatch.setattr(subprocess, "check_call", check_call)
+    monkeypatch.setattr("chat_summary.send_message.osascript_command", command)
 
     return buffer
 
@@ -26,16 +26,57 @@ def test_empty_message(capsys: pytest.CaptureFixture[str]) -> None:
     assert capsys.readouterr().err == "empty message, no message sent\n"
 
 
-@pytest.mark.parametrize("mock_check_call", [False], indirect=True)
-def test_working_messages(capsys: pytest.CaptureFixture[str], mock_check_call: dict[str, list[str]]) -> None:
+@pytest.mark.parametrize("mock_osascript", [False], indirect=True)
+def test_working_messages(capsys: pytest.CaptureFixture[str], mock_osascript: dict[str, list[str]]) -> None:
     send_message("chat", "message")
-    assert mock_check_call["args"] == ["osascript", "-e", f'tell application "Messages"\nsend "message" to chat "chat"\n end tell']
+    assert mock_osascript["args"] == ["osascript", "-e", f'tell application "Messages"\nsend "message" to chat "chat"\n end tell']
     assert capsys.readouterr().out == "message sent successfully!\n"
 
 
-@pytest.mark.parametrize("mock_check_call", [True], indirect=True)
-def test_error_case(capsys: pytest.CaptureFixture[str], mock_check_call: dict[str, list[str]]) -> None:
+@pytest.mark.parametrize("mock_osascript", [True], indirect=True)
+def test_error_case(capsys: pytest.CaptureFixture[str], mock_osascript: dict[str, list[str]]) -> None:
     with pytest.raises(SystemExit) as sys_exit:
         send_message("chat", "message")
     assert sys_exit.value.code == 1
     assert capsys.readouterr().err == "unable to send message to group chat\n"
+
+
+def test_escape_applescript():
+    assert escape_applescript('say "hi" \\o/') == 'say \\"hi\\" \\\\o/'
+    assert 'send "\\"quoted\\"" to chat "chat"' in osascript_command("chat", '"quoted"')[2]
+
+
+@pytest.mark.parametrize(
+    ("message", "max_length", "expected"),
+    (
+        ("short\nmessage", 100, ["short\nmessage"]),
+        ("one\ntwo\nthree", 7, ["one\ntwo", "three"]),
+        ("one\n\ntwo", 4, ["one", "two"]),
+        ("abcdefghij\nk", 4, ["abcd", "efgh", "ij\nk"]),
+        ("ab\ncdefghij", 4, ["ab", "cdef", "ghij"]),
+    ),
+)
+def test_split_message(message: str, max_length: int, expected: list[str]):
+    chunks = split_message(message, max_length)
+    assert chunks == expected
+    assert all(len(chunk) <= max_length for chunk in chunks)
+
+
+# appends the chat name and message to a log, failing for the chat named 'fail'
+STUB = "import sys\nif sys.argv[2] == 'fail':\n    sys.exit('no such chat')\nopen(sys.argv[1], 'a', encoding='utf-8').write(sys.argv[2] + ':' + sys.argv[3] + '|')"
+
+
+def test_send_messages(tmp_path: Path):
+    log = tmp_path / "sent.log"
+    messages = {"chat1": "a\nb\nc", "fail": "a", "chat2": "", "chat3": '"q"'}
+    results = send_messages(messages, program_command([sys.executable, "-c", STUB, str(log)]), concurrency=2, max_length=3)
+    assert results == [SEND_RESULT("chat1", 2, 2), SEND_RESULT("fail", 0, 1, "no such chat"), SEND_RESULT("chat2", 0, 0, "empty message, no message sent"), SEND_RESULT("chat3", 1, 1)]
+
+    sent = log.read_text(encoding="utf-8").split("|")[:-1]
+    assert sorted(sent) == ["chat1:a\nb", "chat1:c", 'chat3:"q"']
+    assert sent.index("chat1:a\nb") < sent.index("chat1:c")  # a chat's chunks are sent in order
+
+
+def test_send_messages_missing_program():
+    (result,) = send_messages({"chat": "message"}, program_command(["/nonexistent/program"]))
+    assert result.sent == 0 and result.error
@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from chat_summary.chat import MESSAGE, ChatMember, ChatSummary
+from chat_summary.games import Nerdle, Wordle
+from chat_summary.state import read_state, write_state
+
+
+def make_summary() -> ChatSummary:
+    return ChatSummary([ChatMember("John", "123"), ChatMember("me", "user")], (Nerdle(), Wordle()), "user")
+
+
+def test_state_roundtrip(tmp_path: Path):
+    path = f"{tmp_path}/state.json"
+    full = make_summary()
+    full.populate([MESSAGE("Wordle 612 4/6", "123", 1), MESSAGE("Wordle 612 3/6", "user", 2), MESSAGE("nerdlegame 10 X/6", "123", 3), MESSAGE("Wordle 614 2/6", "123", 4)])
+
+    first = make_summary()
+    first.populate([MESSAGE("Wordle 612 4/6", "123", 1), MESSAGE("Wordle 612 3/6", "user", 2)])
+    write_state(path, "chat", ["Nerdle", "Wordle"], first)
+
+    state = read_state(path, "chat", ["Nerdle", "Wordle"])
+    assert state is not None and state["last_rowid"] == 2
+
+    second = make_summary()
+    second.load_state(state)
+    second.populate([MESSAGE("nerdlegame 10 X/6", "123", 3), MESSAGE("Wordle 614 2/6", "123", 4)])
+
+    assert second.last_rowid == 4
+    assert second.get_display() == full.get_display()
+
+
+@pytest.mark.parametrize(("chat_name", "game_names"), (("other chat", ["Nerdle", "Wordle"]), ("chat", ["Wordle"])))
+def test_state_mismatch(chat_name: str, game_names: list[str], tmp_path: Path):
+    path = f"{tmp_path}/state.json"
+    write_state(path, "chat", ["Nerdle", "Wordle"], make_summary())
+    assert read_state(path, chat_name, game_names) is None
+
+
+def test_state_missing(tmp_path: Path):
+    assert read_state(f"{tmp_path}/state.json", "chat", []) is None
+
+
+def test_state_corrupt(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    path = f"{tmp_path}/state.json"
+    with open(path, "w") as file:
+        file.write("{not json")
+    assert read_state(path, "chat", []) is None
+    assert capsys.readouterr().err == "unable to read state file, rebuilding summary\n"
+
+
+def test_state_file_contents(tmp_path: Path):
+    path = f"{tmp_path}/state.json"
+    summary = make_summary()
+    summary.populate([MESSAGE("Wordle 612 4/6", "123", 7)])
+    write_state(path, "chat", ["Nerdle", "Wordle"], summary)
+
+    with open(path) as file:
+        state = json.load(file)
+    assert state["last_rowid"] == 7
+    assert state["ranges"]["Wordle"] == [612, 612]
+    assert state["scores"]["Wordle"]["123"] == {"games": [612], "fails": [], "total_guesses": 4}
@@ -0,0 +1,41 @@
+import random
+from pathlib import Path
+
+from chat_summary.games import BUILTIN_GAMES
+from chat_summary.messages import MessagesDB
+from testing.synthetic_db import GAME_MESSAGES, create_addressbook_db, create_chat_db, get_handles
+
+
+def test_synthetic_db(tmp_path: Path):
+    chat_path, addressbook_path = f"{tmp_path}/chat.db", f"{tmp_path}/AddressBook-v22.abcddb"
+    create_chat_db(chat_path, 500, members=5, chats=2, game_ratio=1)
+    create_addressbook_db(addressbook_path, members=5)
+
+    m = MessagesDB("user", ["Chat 2"], False, chat_paths=[chat_path], addressbook_path=addressbook_path)
+    messages, chats = m.get_messages_members_from_chats()
+    (chat,) = chats.values()
+    assert [member.name for member in chat.members] == [
+        "Member1 Synthetic",
+        "Member2 Synthetic",
+        "Member3 Synthetic",
+        "Member4 Synthetic",
+        "Member5 Synthetic",
+        "user",
+    ]  # phone numbers and emails are matched to contacts
+    assert {message.phone_number for message in messages} == {*get_handles(5), "user"}
+
+
+def test_game_messages():
+    # every builtin game is generated, and every generated result is parsed by exactly one game
+    rng = random.Random(0)
+    parsed: set[str] = set()
+    mini_links: set[bool] = set()
+    for make_message in GAME_MESSAGES:
+        for day in range(0, 730, 7):
+            message = make_message(day, rng)
+            (game,) = [game.__name__ for game in BUILTIN_GAMES if game().analyse_message(message) is not None]
+            parsed.add(game)
+            if game == "Mini":
+                mini_links.add(message.startswith("https://"))
+    assert parsed == {game.__name__ for game in BUILTIN_GAMES}
+    assert mini_links == {True, False}  # shared as a link and as a sentence
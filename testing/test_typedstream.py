@@ -0,0 +1,43 @@
+import pytest
+
+from chat_summary.typedstream import decode_attributed_body
+from testing.synthetic_db import make_attributed_body
+
+
+# laid out as Messages writes it: a mutable string, then one attribute run covering its 24 utf-16 units
+MESSAGES_ATTRIBUTED_BODY = (
+    b"\x04\x0bstreamtyped\x81\xe8\x03\x84\x01@\x84\x84\x84\x19NSMutableAttributedString\x00\x84\x84\x12NSAttributedString\x00\x84\x84\x08NSObject\x00\x85\x92"
+    b"\x84\x84\x84\x0fNSMutableString\x01\x84\x84\x08NSString\x01\x95\x84\x01+\x22Wordle 1,042 4/6\n\n\xe2\xac\x9b\xf0\x9f\x9f\xa8\xe2\xac\x9b\xe2\xac\x9b\xe2\xac\x9b\x86"
+    b"\x84\x02iI\x01\x18\x92\x84\x84\x84\x0cNSDictionary\x00\x95\x84\x01i\x01\x92\x84\x98\x98\x1d__kIMMessagePartAttributeName\x86\x92\x84\x84\x84\x08NSNumber\x00"
+    b"\x84\x84\x07NSValue\x00\x95\x84\x01*\x84\x9b\x9b\x00\x86\x86\x86"
+)
+
+
+def test_decode_messages_attributed_body():
+    assert decode_attributed_body(MESSAGES_ATTRIBUTED_BODY) == "Wordle 1,042 4/6\n\n⬛🟨⬛⬛⬛"
+
+
+@pytest.mark.parametrize(
+    "text",
+    (
+        "Wordle 612 4/6",
+        "Wordle 1,042 X/6\n\n⬛⬛🟨⬛⬛\n⬛⬛⬛⬛⬛",
+        "Connections \nPuzzle #123\n" + "🟪🟪🟪🟪\n" * 20,
+        "Connections \nPuzzle #123\n" + "🟪🟪🟪🟪\n" * 4_000,  # longer than 65535 bytes, so its length takes 4 bytes
+        "",
+    ),
+)
+def test_decode(text: str):
+    assert decode_attributed_body(make_attributed_body(text)) == text
+
+
+@pytest.mark.parametrize("attributed_body", (b"", b"garbage", b"NSString", b"NSString\x01\x94\x84\x01+", b"NSString\x01\x94\x84\x01+\x10abc", b"NSString\x01\x94\x84\x01+\x02\xff\xfe"))
+def test_decode_invalid(attributed_body: bytes):
+    assert decode_attributed_body(attributed_body) is None
+
+
+def test_decode_prefixes():
+    attributed_body = make_attributed_body("Wordle 612 4/6")
+    assert decode_attributed_body(attributed_body, (b"nerdlegame ", b"Wordle ")) == "Wordle 612 4/6"
+    assert decode_attributed_body(attributed_body, (b"nerdlegame ",)) is None
+    assert decode_attributed_body(attributed_body, ()) is None